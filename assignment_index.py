@@ -0,0 +1,86 @@
+# #############################################################################
+#
+#  assignment_index.py - the map's assignments by letter, each with the
+#    location where a team marker goes.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  update() is given the current list of Assignment features (from the
+#   session's map cache) and lookup() answers from memory, so checking an
+#   assignment letter and placing a marker need no request to sartopo.  The
+#   marker location (an interior label point, see geometry.py) is worked out
+#   once per feature and kept until the feature's 'updated' timestamp
+#   changes; the features that did change are handled in one batch.  If a
+#   malformed geometry makes the batch fail, they are worked out one at a
+#   time instead, and only the bad ones are left without a location.
+#   plans_console calls update() on its worker thread; it builds new tables
+#   and swaps them in at the end, so lookup() can be called meanwhile.
+#
+# #############################################################################
+
+import logging
+
+log=logging.getLogger(__name__)
+
+class AssignmentIndex():
+    def __init__(self):
+        self.byId={}      # feature id: entry
+        self.byLetter={}  # letter: entry
+        self.computed=0   # number of marker locations worked out, for diagnostics
+
+    def update(self,features):
+        byId={}
+        changed=[]
+        for feature in features:
+            id=feature.get("id")
+            prop=feature.get("properties",{})
+            updated=prop.get("updated")
+            entry=self.byId.get(id)
+            if entry is None or entry["updated"]!=updated or updated is None:
+                entry={"id":id,"updated":updated,"letter":prop.get("letter"),
+                       "feature":feature,"ring":outerRing(feature.get("geometry")),"location":None}
+                changed.append(entry)
+            byId[id]=entry
+        if changed:
+            from geometry import markerLocations    # numpy; not needed until the first assignments arrive
+            try:
+                locs=markerLocations([e["feature"].get("geometry") for e in changed])
+            except (TypeError,ValueError,IndexError):
+                locs=[]
+                for entry in changed:
+                    try:
+                        locs+=markerLocations([entry["feature"].get("geometry")])
+                    except (TypeError,ValueError,IndexError) as e:
+                        log.warning("cannot work out the location of assignment "+str(entry["letter"])+": "+str(e))
+                        locs.append(None)
+            for entry,loc in zip(changed,locs):
+                entry["location"]=loc
+            self.computed+=len(changed)
+        byLetter={}
+        for entry in byId.values():
+            if entry["letter"] and entry["location"]:
+                byLetter.setdefault(str(entry["letter"]),entry)
+        self.byId=byId
+        self.byLetter=byLetter
+
+    def lookup(self,letter):
+        return self.byLetter.get(str(letter))
+
+    def __len__(self):
+        return len(self.byLetter)
+
+# outerRing - the outer ring of a polygon geometry, for keeping team markers
+#  inside it; None for other or malformed geometries
+def outerRing(geometry):
+    coords=(geometry or {}).get("coordinates")
+    try:
+        if coords and type(coords[0][0]) is list:
+            return coords[0]
+    except (TypeError,KeyError,IndexError):
+        pass
+    return None
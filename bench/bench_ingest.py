@@ -0,0 +1,173 @@
+# #############################################################################
+#
+#  bench_ingest.py - measure how well plans_console keeps up with a busy
+#    radiolog, without a display
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Usage:  python bench/bench_ingest.py [--lines N] [--rate R] [--mode rewrite]
+#
+#  Runs plans_console's MainWindow on the offscreen Qt platform in a scratch
+#   directory, against bench/fake_sartopo.py, while bench/radiolog_gen.py
+#   (a separate process) writes the radiolog file.  Reports:
+#   - lines per second ingested, and how far behind the writer the console was
+#   - UI thread stalls: gaps in a 5 ms heartbeat timer, and the time spent
+#     in each refresh
+#   - session save cost as the table grows, including journal compactions
+#
+#  A new session on map BENCH is started from here, as if chosen in the
+#   window's session bar, so the bench runs unattended.
+#
+# #############################################################################
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM","offscreen")
+benchDir=os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(benchDir,".."))
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+import fake_sartopo
+
+def percentile(values,p):
+    values=sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values)-1,int(p/100*len(values)))]
+
+def ms(t):
+    return "%.1f ms"%(1000*t)
+
+def main():
+    parser=argparse.ArgumentParser(description="radiolog ingest benchmark for plans_console")
+    parser.add_argument("--lines",type=int,default=20000)
+    parser.add_argument("--rate",type=float,default=1000.0,help="lines per second written; 0 is as fast as possible")
+    parser.add_argument("--batch",type=int,default=10,help="lines per write")
+    parser.add_argument("--mode",choices=["append","rewrite"],default="append")
+    parser.add_argument("--timeout",type=float,default=120.0,help="seconds to wait for the console to catch up")
+    parser.add_argument("--quiet",action="store_true",help="hide plans_console's own diagnostics")
+    args=parser.parse_args()
+
+    work=tempfile.mkdtemp(prefix="plans_console_bench_")
+    logDir=os.path.join(work,"radiolog")
+    os.makedirs(os.path.join(work,"local"))
+    os.makedirs(logDir)
+    with open(os.path.join(work,"local","plans_console.cfg"),"w") as f:
+        f.write("[Plans_console]\nwatchedDir="+logDir+"\n")
+    os.chdir(work)
+
+    fake=fake_sartopo.FakeSartopo("BENCH",features=100)
+    server=fake_sartopo.start(fake)
+    host="127.0.0.1:"+str(server.server_port)
+
+    import plans_console
+    import sartopo_python
+    from perf_stats import stats
+    SartopoSession=sartopo_python.SartopoSession
+    sartopo_python.SartopoSession=lambda domainAndPort,mapID,**kw:SartopoSession(host,"BENCH")
+    QMessageBox.exec_=lambda self:0
+
+    if args.quiet:
+        sys.stdout=open(os.devnull,"w")
+    out=sys.__stdout__
+
+    app=QApplication([])
+    w=plans_console.MainWindow(app)
+    w.show()
+    w.newSession("BENCH")
+
+    # time every refresh and every session save
+    refreshTimes=[]
+    saves=[]    # (rows in the table, seconds, compacted)
+    refresh=w.refresh
+    def timedRefresh():
+        t0=time.perf_counter()
+        refresh()
+        refreshTimes.append(time.perf_counter()-t0)
+    w.fileNotifier.changed.disconnect()
+    w.fileNotifier.changed.connect(timedRefresh)
+    saveData=w.session.save
+    def timedSave(record):
+        count=w.journal.journalCount
+        t0=time.perf_counter()
+        saveData(record)
+        saves.append((len(w.radioLogStore),time.perf_counter()-t0,w.journal.journalCount<count))
+    w.session.save=timedSave
+
+    # heartbeat: gaps much longer than 5 ms mean the UI thread was busy
+    gaps=[]
+    last=[time.perf_counter()]
+    def beat():
+        now=time.perf_counter()
+        gaps.append(now-last[0])
+        last[0]=now
+    heartbeat=QTimer()
+    heartbeat.timeout.connect(beat)
+    heartbeat.start(5)
+
+    gen=subprocess.Popen([sys.executable,os.path.join(benchDir,"radiolog_gen.py"),"--dir",logDir,
+                          "--lines",str(args.lines),"--rate",str(args.rate),"--batch",str(args.batch),
+                          "--mode",args.mode],stdout=subprocess.PIPE,universal_newlines=True)
+    start=time.perf_counter()
+    genDone=None
+    while time.perf_counter()-start<args.timeout:
+        app.processEvents()
+        time.sleep(0.001)
+        if genDone is None and gen.poll() is not None:
+            genDone=time.perf_counter()
+        if genDone is not None and len(w.radioLogStore)>=args.lines and \
+           len(set(w.radioLogStore.msgs))>=args.lines:    # every generated message is different
+            break
+    end=time.perf_counter()
+    heartbeat.stop()
+    genOut=gen.communicate()[0].strip()
+
+    n=len(w.radioLogStore)
+    unique=len(set(w.radioLogStore.msgs))
+    print("writer: "+genOut,file=out)
+    print("ingested %d of %d lines in %.2f s: %.0f lines/s"%(unique,args.lines,end-start,unique/max(end-start,1e-9)),file=out)
+    if n>unique:
+        print("%d lines were added to the table more than once"%(n-unique),file=out)
+    if genDone:
+        print("caught up %s after the writer finished"%ms(max(end-genDone,0)),file=out)
+    stalls=[g-0.005 for g in gaps]
+    print("UI heartbeat: %d ticks, p50 stall %s, p99 %s, max %s, %d over 50 ms"%(len(gaps),
+          ms(percentile(stalls,50)),ms(percentile(stalls,99)),ms(max(stalls or [0])),
+          len([s for s in stalls if s>0.05])),file=out)
+    if refreshTimes:
+        print("refresh: %d calls, mean %s, p99 %s, max %s"%(len(refreshTimes),
+              ms(sum(refreshTimes)/len(refreshTimes)),ms(percentile(refreshTimes,99)),ms(max(refreshTimes))),file=out)
+    if saves:
+        print("session save by table size:",file=out)
+        top=max(s[0] for s in saves)+1
+        step=max(top//5,1)
+        for lo in range(0,top,step):
+            bucket=[s for s in saves if lo<=s[0]<lo+step]
+            if not bucket:
+                continue
+            times=[s[1] for s in bucket]
+            compactions=[s[1] for s in bucket if s[2]]
+            print("  %6d-%-6d rows: %4d saves, mean %s, max %s, %d compactions%s"%(lo,lo+step-1,len(bucket),
+                  ms(sum(times)/len(times)),ms(max(times)),len(compactions),
+                  (" (mean %s)"%ms(sum(compactions)/len(compactions))) if compactions else ""),file=out)
+    print("perf_stats:",file=out)
+    for line in stats.summary():
+        print("  "+line,file=out)
+    w.close()
+    server.shutdown()
+    return 0 if unique>=args.lines else 1
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# #############################################################################
+#
+#  bench_sartopo.py - measure SartopoSession and the team marker operations
+#    behind plans_console's OK button against a local fake sartopo server
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Usage:  python bench/bench_sartopo.py [--features N] [--latency S] ...
+#
+#  Starts bench/fake_sartopo.py in-process, then reports:
+#   - session setup time
+#   - getFeatures throughput, whole-response and streamed
+#   - syncFeatures time for a full and a delta sync
+#   - latency and requests sent for assign, move and remove of a team
+#     marker, and for a burst of moves of one team coalesced in the outbox,
+#     going through the same outbox and TeamMarkers code as the console
+#
+#  Nothing is sent anywhere but the local fake server.
+#
+# #############################################################################
+
+import os
+import io
+import sys
+import time
+import json
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+import fake_sartopo
+from sartopo_python import SartopoSession
+from sartopo_outbox import SartopoOutbox
+from team_markers import TeamMarkers
+
+def percentile(values,p):
+    values=sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values)-1,int(p/100*len(values)))]
+
+def report(name,times,requests=None):
+    line="%-28s n=%-4d mean %8.1f ms  p50 %8.1f ms  p99 %8.1f ms"%(name,len(times),
+          1000*sum(times)/len(times),1000*percentile(times,50),1000*percentile(times,99))
+    if requests is not None:
+        line+="  requests/op %s"%json.dumps(requests)
+    print(line)
+
+def timed(func,*args,quiet=True):
+    # run func, hiding its diagnostic prints; returns (elapsed seconds, result)
+    out=io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(out):
+        t0=time.perf_counter()
+        rval=func(*args)
+        return time.perf_counter()-t0,rval
+
+def perOp(counts,n):
+    return {k:round(v/n,2) for k,v in sorted(counts.items())}
+
+def main():
+    parser=argparse.ArgumentParser(description="benchmark SartopoSession against a local fake sartopo server")
+    parser.add_argument("--features",type=int,default=5000,help="features on the generated map")
+    parser.add_argument("--vertices",type=int,default=40,help="vertices per line or polygon")
+    parser.add_argument("--latency",type=float,default=0.02,help="seconds added to every request")
+    parser.add_argument("--teams",type=int,default=20,help="teams to assign, move and remove")
+    parser.add_argument("--runs",type=int,default=5,help="repetitions of the getFeatures/sync measurements")
+    args=parser.parse_args()
+
+    fake=fake_sartopo.FakeSartopo("BENCH",args.features,args.vertices,args.latency)
+    server=fake_sartopo.start(fake)
+    host="127.0.0.1:"+str(server.server_port)
+    print("fake map: %d features, %.1f MB since/0 response, %.0f ms latency"%(
+          len(fake.features),len(fake.since(0))/1e6,1000*args.latency))
+
+    t,sts=timed(SartopoSession,host,"BENCH")
+    report("session setup",[t])
+    if sts.apiVersion<0:
+        print("could not connect to the fake server")
+        return 1
+
+    for stream in [False,True]:
+        times=[]
+        for i in range(args.runs):
+            t,rval=timed(sts.getFeatures,"Folder",0,stream)
+            times.append(t)
+        report("getFeatures %s"%("streamed" if stream else "whole"),times)
+        print("%-28s %.0f features/s"%("",len(fake.features)*len(times)/sum(times)))
+
+    sts.cacheClasses=["Folder","Marker","Assignment"]
+    full=[]
+    delta=[]
+    for i in range(args.runs):
+        sts.mapState={}
+        for index in sts.featureIndex.values():
+            index.clear()
+        sts.mapStateTimestamp=0
+        sts.mapStateSyncTime=0
+        full.append(timed(sts.syncFeatures)[0])
+        sts.mapStateSyncTime=0
+        delta.append(timed(sts.syncFeatures)[0])
+    report("syncFeatures full",full)
+    report("syncFeatures delta",delta)
+
+    # team marker operations, as queued by the console's OK button
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox=SartopoOutbox(os.path.join(tmp,"outbox.db"))
+        markers=TeamMarkers(sts,outbox)
+        timed(markers.flush)    # first flush syncs and reconciles
+        teams=["T%d"%i for i in range(args.teams)]
+        def op(name,opName,argsFor):
+            fake.resetCounts()
+            times=[]
+            for team in teams:
+                outbox.enqueue(opName,argsFor(team),key=team)
+                t,ok=timed(markers.flush)
+                if not ok:
+                    print(name+" failed for "+team)
+                times.append(t)
+            report(name,times,perOp(fake.counts,len(teams)))
+        op("assign (new marker)","setMarker",lambda team:[team,"AA","GND"," ",39.2,-121.0])
+        op("move (in place)","setMarker",lambda team:[team,"AB","GND"," ",39.21,-121.01])
+        op("remove","delMarker",lambda team:[team])
+
+        # a burst of moves of one team before the outbox is flushed
+        fake.resetCounts()
+        outbox.enqueue("setMarker",["B1","AA","GND"," ",39.2,-121.0],key="B1")
+        timed(markers.flush)
+        fake.resetCounts()
+        for i in range(10):
+            outbox.enqueue("setMarker",["B1","AA","GND"," ",39.2+i*0.001,-121.0],key="B1")
+        t,ok=timed(markers.flush)
+        report("10 moves, one flush",[t],perOp(fake.counts,1))
+        outbox.close()
+
+    print("session request stats: "+json.dumps({k:{"count":v["count"],"avgMs":round(1000*v["avgTime"],1)}
+                                                 for k,v in sts.getStats().items()}))
+    server.shutdown()
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
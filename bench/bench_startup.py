@@ -0,0 +1,170 @@
+# #############################################################################
+#
+#  bench_startup.py - measure how long plans_console takes to start, and to
+#    show the first radiolog row
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Usage:  python bench/bench_startup.py [--runs 5] [--latency 0.3]
+#
+#  Reports:
+#  - import time of plans_console from python -X importtime, with the
+#    modules it imports directly, slowest first
+#  - time from process start to: plans_console imported, main window shown,
+#    first radiolog row in the table, and sartopo session connected.  Each
+#    run is a fresh process on the offscreen Qt platform, in a scratch
+#    directory holding a radiolog csv file, against bench/fake_sartopo.py
+#    with the given latency per request; the new session is started as soon
+#    as the window is shown
+#
+#  The sartopo API version cache is removed before each run (so every run
+#   probes the server) unless --warm is given.
+#
+# #############################################################################
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+benchDir=os.path.dirname(os.path.abspath(__file__))
+repoDir=os.path.join(benchDir,"..")
+
+def median(values):
+    values=sorted(values)
+    return values[len(values)//2] if values else 0.0
+
+def ms(t):
+    return "%.0f ms"%(1000*t)
+
+# importTimes - (total seconds, {module: cumulative seconds}) for the
+#  modules plans_console imports directly, from one -X importtime run
+def importTimes(env):
+    p=subprocess.run([sys.executable,"-X","importtime","-c","import plans_console"],cwd=repoDir,env=env,
+                     stdout=subprocess.DEVNULL,stderr=subprocess.PIPE,universal_newlines=True)
+    total=0.0
+    direct={}
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields=line[len("import time:"):].split("|")
+        try:
+            cumulative=int(fields[1])/1e6
+        except ValueError:
+            continue    # the header line
+        name=fields[2]
+        depth=(len(name)-len(name.lstrip()))//2
+        if name.strip()=="plans_console":
+            total=cumulative
+        elif depth==1:
+            direct[name.strip()]=direct.get(name.strip(),0.0)+cumulative
+    return total,direct
+
+# child - runs in the measured process
+def child(url,timeout):
+    t0=float(os.environ["BENCH_T0"])
+    import plans_console
+    tImport=time.time()
+    from PyQt5.QtWidgets import QApplication
+    app=QApplication([])
+    w=plans_console.MainWindow(app)
+    w.show()
+    app.processEvents()
+    tShown=time.time()
+    w.newSession(url)
+    tRow=tConnected=None
+    while time.time()-t0<timeout and (tRow is None or tConnected is None):
+        app.processEvents()
+        if tRow is None and len(w.radioLogStore):
+            tRow=time.time()
+        if tConnected is None and w.sts is not None:
+            tConnected=time.time()
+        time.sleep(0.001)
+    link=w.sts.apiVersion if w.sts else None
+    w.close()
+    print(json.dumps({"import":tImport-t0,"shown":tShown-t0,"firstRow":tRow and tRow-t0,
+                      "connected":tConnected and tConnected-t0,"link":link}))
+    sys.stdout.flush()
+    os._exit(0)     # do not wait for a probe still running in the background
+
+def main():
+    parser=argparse.ArgumentParser(description="startup benchmark for plans_console")
+    parser.add_argument("--runs",type=int,default=5)
+    parser.add_argument("--lines",type=int,default=2000,help="lines in the radiolog file")
+    parser.add_argument("--latency",type=float,default=0.3,help="seconds added to every fake sartopo request")
+    parser.add_argument("--warm",action="store_true",help="keep the sartopo API version cache between runs")
+    parser.add_argument("--top",type=int,default=10,help="direct imports to list")
+    parser.add_argument("--timeout",type=float,default=30.0)
+    parser.add_argument("--child",help=argparse.SUPPRESS)
+    args=parser.parse_args()
+    if args.child:
+        return child(args.child,args.timeout)
+
+    env=dict(os.environ,QT_QPA_PLATFORM="offscreen")
+    env["PYTHONPATH"]=os.pathsep.join([os.path.abspath(repoDir)]+[p for p in [env.get("PYTHONPATH")] if p])
+
+    runs=[importTimes(env) for i in range(args.runs)]
+    totals=[r[0] for r in runs]
+    print("import plans_console: median %s, min %s, max %s (python -X importtime, %d runs)"%(
+          ms(median(totals)),ms(min(totals)),ms(max(totals)),args.runs))
+    direct={}
+    for total,d in runs:
+        for name,t in d.items():
+            direct.setdefault(name,[]).append(t)
+    for name,times in sorted(direct.items(),key=lambda item:-median(item[1]))[:args.top]:
+        print("  %-28s %s"%(name,ms(median(times))))
+
+    sys.path.insert(0,benchDir)
+    import fake_sartopo
+    fake=fake_sartopo.FakeSartopo("BENCH",features=100,latency=args.latency)
+    server=fake_sartopo.start(fake)
+    url="127.0.0.1:%d/m/BENCH"%server.server_port
+
+    work=tempfile.mkdtemp(prefix="plans_console_startup_")
+    logDir=os.path.join(work,"radiolog")
+    os.makedirs(os.path.join(work,"local"))
+    with open(os.path.join(work,"local","plans_console.cfg"),"w") as f:
+        f.write("[Plans_console]\nwatchedDir="+logDir+"\n")
+    with open(os.path.join(work,"plans_console.rc"),"w") as f:
+        f.write("[Plans_console]\nfont-size=12pt\nx=100\ny=100\nw=1600\nh=1000\n")
+    subprocess.run([sys.executable,os.path.join(benchDir,"radiolog_gen.py"),"--dir",logDir,
+                    "--lines",str(args.lines),"--rate","0","--batch",str(args.lines)],
+                   stdout=subprocess.DEVNULL,check=True)
+
+    results=[]
+    for i in range(args.runs):
+        cache=os.path.join(work,"local","sartopo_probe_cache.json")
+        if not args.warm and os.path.isfile(cache):
+            os.remove(cache)
+        env["BENCH_T0"]=repr(time.time())
+        p=subprocess.run([sys.executable,os.path.abspath(__file__),"--child",url,"--timeout",str(args.timeout)],
+                         cwd=work,env=env,stdout=subprocess.PIPE,stderr=subprocess.DEVNULL,universal_newlines=True)
+        lines=[l for l in p.stdout.splitlines() if l.startswith("{")]
+        if not lines:
+            print("run %d failed"%(i+1))
+            continue
+        results.append(json.loads(lines[-1]))
+    server.shutdown()
+    if not results:
+        return 1
+    print("from process start (%d runs, %s per sartopo request, %s API version cache):"%(
+          len(results),ms(args.latency),"warm" if args.warm else "cold"))
+    for key,label in [("import","plans_console imported"),("shown","window shown"),
+                      ("firstRow","first radiolog row"),("connected","sartopo connected")]:
+        values=[r[key] for r in results if r[key] is not None]
+        if len(values)<len(results):
+            print("  %-24s not reached in %d run(s)"%(label,len(results)-len(values)))
+        if values:
+            print("  %-24s median %s, min %s, max %s"%(label,ms(median(values)),ms(min(values)),ms(max(values))))
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
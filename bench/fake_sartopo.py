@@ -0,0 +1,240 @@
+# #############################################################################
+#
+#  fake_sartopo.py - a local stand-in for a sartopo map server, for
+#    benchmarking plans_console and sartopo_python offline
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Implements the part of the API v1 that sartopo_python uses:
+#
+#    GET    /api/v1/map/                        API detection
+#    GET    /m/<mapID>                          map id validation
+#    GET    /api/v1/map/<mapID>/since/<t>       features changed after t (ms)
+#    POST   /api/v1/map/<mapID>/Folder          new folder
+#    POST   /api/v1/map/<mapID>/Marker[/<id>]   new marker, or move one
+#    DELETE /api/v1/map/<mapID>/Marker/<id>     delete a marker
+#
+#  Every request waits 'latency' seconds before it is answered, and is
+#   counted by method and endpoint (see FakeSartopo.counts).  The map is
+#   filled with a generated mix of markers, line shapes and assignment
+#   polygons (letters AA, AB, ...) plus an aTEAMS folder.
+#
+#  Run on its own:
+#    python bench/fake_sartopo.py --port 8080 --features 5000 --latency 0.05
+#  then point plans_console at http://localhost:8080/m/BENCH
+#
+# #############################################################################
+
+import re
+import sys
+import socket
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import itertools
+import http.server
+from urllib.parse import parse_qs
+
+def letterName(i):
+    # AA, AB, ... AZ, BA, ...
+    return chr(65+(i//26)%26)+chr(65+i%26)
+
+class FakeSartopo():
+    def __init__(self,mapID="BENCH",features=1000,vertices=40,latency=0.0,seed=1):
+        self.mapID=mapID
+        self.latency=latency
+        self.lock=threading.Lock()
+        self.features={}    # id: feature
+        self.counts={}      # "METHOD endpoint": number of requests
+        self.ids=itertools.count(1)
+        self.sinceCache=None    # (version, encoded since/0 response)
+        self.version=0
+        self.generate(features,vertices,seed)
+
+    def now(self):
+        return int(time.time()*1000)
+
+    def newId(self):
+        return "%08x-fake"%next(self.ids)
+
+    def generate(self,n,vertices,seed):
+        rnd=random.Random(seed)
+        t=self.now()-60000     # as if drawn a minute ago
+        self.add({"properties":{"class":"Folder","title":"aTEAMS"}},t)
+        for i in range(n):
+            lat=39.2+rnd.uniform(-0.1,0.1)
+            lon=-121.0+rnd.uniform(-0.1,0.1)
+            kind=i%10
+            if kind==0:     # assignment polygon
+                r=rnd.uniform(0.002,0.01)
+                ring=[[lon+r*1.3*math.cos(2*math.pi*k/vertices),lat+r*math.sin(2*math.pi*k/vertices)]
+                      for k in range(vertices)]
+                ring.append(ring[0])
+                self.add({"properties":{"class":"Assignment","title":letterName(i//10),
+                                        "letter":letterName(i//10)},
+                          "geometry":{"type":"Polygon","coordinates":[ring]}},t)
+            elif kind<=2:   # track or line shape
+                line=[[lon+k*0.0002,lat+rnd.uniform(-0.0002,0.0002)] for k in range(vertices)]
+                self.add({"properties":{"class":"Shape","title":"line %d"%i},
+                          "geometry":{"type":"LineString","coordinates":line}},t)
+            else:
+                self.add({"properties":{"class":"Marker","title":"marker %d"%i,"marker-symbol":"point"},
+                          "geometry":{"type":"Point","coordinates":[lon,lat]}},t)
+
+    def add(self,feature,t=None,id=None):
+        feature["id"]=id or self.newId()
+        feature["type"]="Feature"
+        feature["properties"]["updated"]=t or self.now()
+        self.features[feature["id"]]=feature
+        self.version+=1
+        return feature["id"]
+
+    def count(self,key):
+        with self.lock:
+            self.counts[key]=self.counts.get(key,0)+1
+
+    def resetCounts(self):
+        with self.lock:
+            self.counts={}
+
+    def since(self,t):
+        with self.lock:
+            if t==0 and self.sinceCache and self.sinceCache[0]==self.version:
+                return self.sinceCache[1]
+            now=self.now()
+            ids={}
+            for id,f in self.features.items():
+                ids.setdefault(f["properties"]["class"],[]).append(id)
+            changed=[f for f in self.features.values() if f["properties"]["updated"]>t]
+            body=json.dumps({"status":"ok","timestamp":now,"result":{"timestamp":now,"ids":ids,
+                             "state":{"type":"FeatureCollection","features":changed}}}).encode()
+            if t==0:
+                self.sinceCache=(self.version,body)
+            return body
+
+    def post(self,cls,id,j):
+        with self.lock:
+            prop=dict(j.get("properties",{}))
+            prop["class"]=cls
+            if id and id not in self.features:
+                return None
+            feature={"properties":prop}
+            if "geometry" in j:
+                feature["geometry"]=j["geometry"]
+            return self.add(feature,id=id or None)
+
+    def delete(self,id):
+        with self.lock:
+            if self.features.pop(id,None) is None:
+                return False
+            self.version+=1
+            return True
+
+def makeHandler(fake):
+    mapPath="/api/v1/map/"+fake.mapID+"/"
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version="HTTP/1.1"
+
+        def setup(self):
+            http.server.BaseHTTPRequestHandler.setup(self)
+            # headers and body are written separately; without this, Nagle's
+            #  algorithm and the client's delayed ACK add ~40 ms to every reply
+            self.request.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+
+        def log_message(self,*args):
+            pass
+
+        def reply(self,body,code=200,contentType="application/json"):
+            if not isinstance(body,bytes):
+                body=json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type",contentType)
+            self.send_header("Content-Length",str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def endpoint(self):
+            # path within the map, e.g. 'Marker/<id>' or 'since/0'
+            if self.path.startswith(mapPath):
+                return self.path[len(mapPath):]
+            return None
+
+        def do_GET(self):
+            time.sleep(fake.latency)
+            if self.path=="/api/v1/map/":
+                fake.count("GET api")
+                return self.reply({"status":"ok"})
+            if self.path.startswith("/m/"):
+                fake.count("GET map")
+                if self.path=="/m/"+fake.mapID:
+                    return self.reply(b"<html></html>",contentType="text/html")
+                return self.reply(b"not found",404,"text/plain")
+            end=self.endpoint()
+            m=re.match(r"since/(\d+)$",end or "")
+            if m:
+                fake.count("GET since")
+                return self.reply(fake.since(int(m.group(1))))
+            fake.count("GET other")
+            self.reply({"status":"fail","message":"not found"},404)
+
+        def do_POST(self):
+            body=self.rfile.read(int(self.headers.get("Content-Length",0))).decode()
+            time.sleep(fake.latency)
+            end=self.endpoint() or ""
+            parts=end.split("/")
+            cls=parts[0].capitalize()
+            fake.count("POST "+cls)
+            if cls not in ["Folder","Marker"]:
+                return self.reply({"status":"fail","message":"not supported"},404)
+            try:
+                j=json.loads(parse_qs(body).get("json",["{}"])[0])
+            except ValueError:
+                return self.reply({"status":"fail","message":"bad json"},400)
+            id=fake.post(cls,parts[1] if len(parts)>1 else "",j)
+            if id is None:
+                return self.reply({"status":"fail","message":"no such feature"},404)
+            self.reply({"status":"ok","result":{"id":id}})
+
+        def do_DELETE(self):
+            time.sleep(fake.latency)
+            parts=(self.endpoint() or "").split("/")
+            fake.count("DELETE "+parts[0].capitalize())
+            if len(parts)<2 or not fake.delete(parts[1]):
+                return self.reply({"status":"fail","message":"no such feature"},404)
+            self.reply({"status":"ok","result":{}})
+    return Handler
+
+# start - serve fake in a background thread; returns the server (call its
+#  shutdown() to stop it).  port 0 picks a free port: see server.server_port
+def start(fake,port=0,host="127.0.0.1"):
+    server=http.server.ThreadingHTTPServer((host,port),makeHandler(fake))
+    server.daemon_threads=True
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    return server
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="local stand-in for a sartopo map server")
+    parser.add_argument("--port",type=int,default=8080)
+    parser.add_argument("--map",default="BENCH",help="map id")
+    parser.add_argument("--features",type=int,default=1000,help="number of generated features")
+    parser.add_argument("--vertices",type=int,default=40,help="vertices per line or polygon")
+    parser.add_argument("--latency",type=float,default=0.0,help="seconds added to every request")
+    args=parser.parse_args()
+    fake=FakeSartopo(args.map,args.features,args.vertices,args.latency)
+    server=start(fake,args.port,"0.0.0.0")
+    print("fake sartopo map "+args.map+" with "+str(len(fake.features))+" features on port "+str(server.server_port))
+    try:
+        while True:
+            time.sleep(10)
+            print("requests: "+json.dumps(fake.counts))
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
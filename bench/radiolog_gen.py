@@ -0,0 +1,114 @@
+# #############################################################################
+#
+#  radiolog_gen.py - write a synthetic radiolog .csv file at a controlled
+#    rate, for benchmarking plans_console's ingest
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Each line has radiolog's ten columns:
+#    time, to/from, callsign, message, radio location, status, epoch, 3 spare
+#  Messages often contain commas and quotes, so the csv quoting is exercised.
+#
+#  --mode append    append each batch to the file (default)
+#  --mode rewrite   rewrite the whole file for each batch, the way radiolog
+#                   saves: truncate, then write every line again
+#  --rotate N       start a new file (a new, newer name in the directory)
+#                   after every N lines
+#
+#  Usage:
+#    python bench/radiolog_gen.py --dir C:/radiolog --lines 20000 --rate 200
+#
+# #############################################################################
+
+import os
+import csv
+import sys
+import time
+import random
+import argparse
+
+callsigns=["Team %d"%i for i in range(1,41)]+["K9 %d"%i for i in range(1,6)]+ \
+          ["SO %d"%i for i in range(1,11)]+["IC","Command"]
+statuses=["At IC","Available","In Transit","Waiting for Transport","Working",
+          "Enroute to IC","STANDBY",""]
+messages=['checking in, all %d members present',
+          'at the trailhead, starting assignment %s',
+          'found "possible" track, heading north, will follow',
+          'subject seen near %s, requesting K9',
+          'radio check: loud and clear',
+          'completed assignment %s, POD 70%%, returning',
+          'need water, batteries, and a relay at the ridge, over',
+          'clue: blue jacket, size M, at %s']
+
+def makeLine(rnd,i):
+    t=time.time()
+    msg=rnd.choice(messages)
+    if "%d" in msg:
+        msg=msg%rnd.randint(2,8)
+    elif "%s" in msg:
+        msg=msg%(chr(65+rnd.randint(0,25))+chr(65+rnd.randint(0,25)))
+    return [time.strftime("%H%M",time.localtime(t)),rnd.choice(["FROM","TO"]),
+            rnd.choice(callsigns),msg+" (%d)"%i,
+            "" if rnd.random()<0.7 else "39.%06d -121.%06d"%(rnd.randint(0,999999),rnd.randint(0,999999)),
+            rnd.choice(statuses),"%.3f"%t,"","",""]
+
+def fileName(dir,n):
+    # radiolog style: <date>_<time>_<incident>.csv, sorting in creation order
+    return os.path.join(dir,time.strftime("%Y_%m_%d_%H%M%S")+"_bench%03d.csv"%n)
+
+def writeRows(f,rows):
+    csv.writer(f,lineterminator="\n").writerows(rows)
+    f.flush()
+
+def main():
+    parser=argparse.ArgumentParser(description="write a synthetic radiolog csv file")
+    parser.add_argument("--dir",required=True,help="directory to write into (plans_console's watchedDir)")
+    parser.add_argument("--lines",type=int,default=10000)
+    parser.add_argument("--rate",type=float,default=100.0,help="lines per second; 0 writes as fast as possible")
+    parser.add_argument("--batch",type=int,default=1,help="lines written together")
+    parser.add_argument("--mode",choices=["append","rewrite"],default="append")
+    parser.add_argument("--rotate",type=int,default=0,help="start a new file after this many lines")
+    parser.add_argument("--seed",type=int,default=1)
+    args=parser.parse_args()
+
+    rnd=random.Random(args.seed)
+    os.makedirs(args.dir,exist_ok=True)
+    fileNumber=0
+    name=fileName(args.dir,fileNumber)
+    written=[]      # lines of the current file, for rewrite mode
+    inFile=0
+    start=time.time()
+    i=0
+    while i<args.lines:
+        rows=[makeLine(rnd,i+k) for k in range(min(args.batch,args.lines-i))]
+        if args.rotate and inFile+len(rows)>args.rotate:
+            rows=rows[:args.rotate-inFile]
+        if args.mode=="append":
+            with open(name,"a",newline="") as f:
+                writeRows(f,rows)
+        else:
+            written.extend(rows)
+            with open(name,"w",newline="") as f:
+                writeRows(f,written)
+        i+=len(rows)
+        inFile+=len(rows)
+        if args.rotate and inFile>=args.rotate and i<args.lines:
+            fileNumber+=1
+            time.sleep(1.0)    # the new file must sort after the old one
+            name=fileName(args.dir,fileNumber)
+            written=[]
+            inFile=0
+        if args.rate>0:
+            delay=start+i/args.rate-time.time()
+            if delay>0:
+                time.sleep(delay)
+    elapsed=time.time()-start
+    print("wrote %d lines in %.2f s (%.0f lines/s) to %d file(s)"%(i,elapsed,i/max(elapsed,1e-9),fileNumber+1))
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+# #############################################################################
+#
+#  console_session.py - a plans_console session without any GUI: the
+#    radiolog rows, the teams, the session journal and the map outbox
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Shared by plans_console (the GUI) and plans_console_headless, so that both
+#   read the radiolog, keep and restore the session, and queue map operations
+#   the same way.  The session changes only through records (see
+#   session_journal.py): applyRecord replays one, commit applies a change
+#   made here and journals it, and addRows appends radiolog rows read by
+#   readRows.  Every journaled record is also passed to the listeners, which
+#   is how plans_console_headless relays the session to GUI clients.
+#
+#  A GUI connected to plans_console_headless (see session_link.py) keeps a
+#   session too, as its copy of the server's; it sets client, and then
+#   commit and queueMapOp send to the server instead of writing anything
+#   here.
+#
+# #############################################################################
+
+import logging
+import os
+
+from radiolog_store import RadioLogStore
+from session_journal import SessionJournal
+from sartopo_outbox import SartopoOutbox
+from team_status import TeamStatusStore
+from perf_stats import stats
+
+log=logging.getLogger(__name__)
+
+# API versions found by SartopoSession, reused for a few minutes across restarts
+probeCacheFile="./local/sartopo_probe_cache.json"
+
+# readConfig - the settings in a plans_console config file, as a dict of
+#  strings, and what is wrong with the file (None if nothing); a missing or
+#  invalid file gives no settings.  After the [Plans_console] line each
+#  setting is a key=value line; spaces around either are ignored, and so are
+#  blank lines and lines starting with #
+def readConfig(fileName):
+    try:
+        with open(fileName,'r',encoding='utf-8') as f:
+            lines=f.read().splitlines()
+    except (OSError,UnicodeDecodeError) as e:
+        return {},"cannot read configuration file "+fileName+": "+str(e)
+    if not lines or lines[0].strip()!="[Plans_console]":
+        return {},fileName+" is not a valid configuration file"
+    config={}
+    for line in lines[1:]:
+        tokens=line.split("=",1)
+        if len(tokens)==2 and not line.lstrip().startswith("#"):
+            config[tokens[0].strip()]=tokens[1].strip()
+    return config,None
+
+# mapUrl - the url of a map given as in the plans_console session bar: a
+#  full URL, #id for a map on sartopo.com, or a bare id for localhost:8080
+def mapUrl(map):
+    map=(map or "").strip()
+    if not map:
+        return None
+    if "/" in map:
+        return map.replace("http://","").replace("https://","")
+    if "#" in map:
+        return "sartopo.com/m/"+map[map.index("#")+1:]  # remove the #
+    return "localhost:8080/m/"+map
+
+# recordSartopoRequest - SartopoSession request observer; called after each
+#  request, on whichever thread made it
+def recordSartopoRequest(type,elapsed,ok):
+    stats.record("sartopo "+type,elapsed)
+    stats.count("sartopo requests")
+    if not ok:
+        stats.count("sartopo failures")
+
+class ConsoleSession():
+    def __init__(self,watchedDir,sessionFileName="save_plans_console.txt",
+                 outboxFileName="./local/plans_console_outbox.db"):
+        self.watchedDir=watchedDir
+        self.url=None
+        self.watchedFile=None
+        self.offsetFileName=None
+        self.csvFiles=[]
+        self.tailer=None
+        self.dirIndex=None
+        self.store=RadioLogStore()
+        self.teams={}       # team: [assign,type,med], oldest first
+        self.teamStatus=TeamStatusStore()   # each team's latest status and contact
+        self.journal=SessionJournal(sessionFileName)
+        self.outbox=SartopoOutbox(outboxFileName)
+        self.listeners=[]   # functions called with every journaled record
+        self.client=None    # a SessionClient when this is a copy of a server's session
+
+    # start - begin a new session on the given map (url; None for no map),
+    #  discarding the saved one
+    def start(self,url):
+        self.url=url
+        self.journal.start(fresh=True)
+        self.save({"t":"session","url":url})
+
+    # restored - call when the saved session (journal.records()) has been
+    #  replayed; a journal is folded into a fresh snapshot
+    def restored(self):
+        if self.journal.journalCount or self.journal.legacy:
+            self.journal.compact(self.sessionRecords())
+
+    def applyRecord(self,record):
+        t=record.get("t")
+        if t=="session":
+            self.url=record.get("url",self.url)
+            self.watchedFile=record.get("csv",self.watchedFile)
+            self.offsetFileName=record.get("offset",self.offsetFileName)
+            self.csvFiles=record.get("csvFiles",self.csvFiles)
+        elif t=="rows":
+            self.teamStatus.updateRows(record["rows"],len(self.store),record.get("ep"))
+            self.store.extend(record["rows"],record.get("fp"),record.get("ep"))
+        elif t=="hl":
+            if 0<=record["i"]<len(self.store):
+                self.store.setHighlighted(record["i"],record["v"])
+        elif t=="team":
+            self.teams[record["team"]]=[record["assign"],record["type"],record["med"]]
+        elif t=="rmteam":
+            self.teams.pop(record["team"],None)
+
+    # sessionRecords - the current session state as journal records
+    def sessionRecords(self):
+        yield {"t":"session","url":self.url,"csv":self.watchedFile,"offset":self.offsetFileName,
+               "csvFiles":self.csvFiles}
+        store=self.store
+        for start in range(0,len(store),1000):
+            end=min(start+1000,len(store))
+            yield {"t":"rows","rows":[list(store.row(i))+[int(store.isHighlighted(i))] for i in range(start,end)],
+                   "fp":store.fingerprints[start:end].tolist(),"ep":store.epochs[start:end].tolist()}
+        for team,(assign,type,med) in self.teams.items():
+            yield {"t":"team","team":team,"assign":assign,"type":type,"med":med}
+
+    # save - journal one session event; the whole session is only rewritten
+    #  (compacted into the snapshot) every journal.compactEvery events
+    def save(self,record):
+        if self.client:
+            self.client.send(record)
+            return
+        with stats.timer("save"):
+            self.journal.append(record)
+        if self.journal.needsCompaction():
+            log.info("compacting session journal")
+            with stats.timer("compact"):
+                self.journal.compact(self.sessionRecords())
+        for listener in self.listeners:
+            listener(record)
+
+    # commit - a change made here (a team, or a row's highlight): apply it and
+    #  save it
+    def commit(self,record):
+        self.applyRecord(record)
+        self.save(record)
+
+    # queueMapOp - record a map operation in the outbox (see sartopo_outbox.py)
+    def queueMapOp(self,op,args,key=None):
+        if self.client:
+            self.client.send({"t":"op","op":op,"args":args,"key":key})
+            return
+        self.outbox.enqueue(op,args,key)
+
+    def scanDir(self,force=False):
+        if self.dirIndex is None:
+            from dir_index import CsvDirIndex
+            self.dirIndex=CsvDirIndex(self.watchedDir)
+        self.csvFiles=self.dirIndex.scan(force)
+        log.debug("Files: %s"%[l[0] for l in self.csvFiles])
+        return self.csvFiles
+
+    # rescan - look for the newest csv file; None if there is none yet, False
+    #  if it is the one being read (reading carries on from the last verified
+    #  offset, or from the beginning if the file was rewritten), True if
+    #  reading switched to it.  A new file is read from the beginning, and
+    #  lines that are already in the store are recognised by their
+    #  fingerprints
+    def rescan(self,force=False):
+        log.debug("scanning "+self.watchedDir+" for latest valid csv file...")
+        if not self.scanDir(force):
+            return None
+        if self.csvFiles[0][0]==self.watchedFile and self.offsetFileName:
+            if self.tailer and not self.tailer.verify():
+                log.info("watched file was rewritten; reading from the beginning")
+                self.tailer.restart()
+            return False
+        if self.tailer:
+            self.tailer.close()
+            self.tailer=None
+        self.watchedFile=self.csvFiles[0][0]
+        # remove the offset file, if any, so the tailer will read from the
+        #  beginning even if this file has already been read
+        self.offsetFileName=self.watchedFile+".offset"+str(os.getpid())
+        if os.path.isfile(self.offsetFileName):
+            os.remove(self.offsetFileName)
+        log.info("  found "+self.watchedFile)
+        self.save({"t":"session","csv":self.watchedFile,"offset":self.offsetFileName,
+                   "csvFiles":self.csvFiles})
+        return True
+
+    # readRows - the rows, their fingerprints and their epochs, for the lines
+    #  added to the watched file since the last call; lines read again (after
+    #  the file was rewritten) are dropped
+    def readRows(self):
+        # the tailer stays open between calls; it resumes from the offset
+        #  file when the session was restored
+        if self.tailer is None:
+            from csv_tailer import CsvTailer
+            self.tailer=CsvTailer(self.watchedFile,self.offsetFileName)
+        with stats.timer("tail read"):
+            entries=self.tailer.readLines()
+        if not entries:
+            return [],[],[]
+        rows,fingerprints,epochs=self.store.newEntries(entries)
+        if len(rows)<len(entries):
+            stats.count("lines skipped",len(entries)-len(rows))
+        return rows,fingerprints,epochs
+
+    # rereadIn - seconds after which readRows should be called again even if
+    #  the watched file does not change: it was seen shorter than what was
+    #  read, and may stay that way (see CsvTailer.graceLeft); None if not
+    def rereadIn(self):
+        if self.tailer is None:
+            return None
+        return self.tailer.graceLeft()
+
+    # addRows - append rows to the store, through append if given (the GUI's
+    #  table model, which tells the view), update the team status, and save
+    #  them unless they came from the server
+    def addRows(self,rows,fingerprints,epochs=None,append=None,save=True):
+        if not rows:
+            return
+        start=len(self.store)
+        with stats.timer("table insert"):
+            (append or self.store.extend)(rows,fingerprints,epochs)
+        with stats.timer("team status"):
+            self.teamStatus.updateRows(rows,start,epochs)
+        stats.count("rows",len(rows))
+        log.debug("%d new rows",len(rows))
+        if save:
+            self.save({"t":"rows","rows":rows,"fp":fingerprints,"ep":epochs})
+
+    # openMap - a SartopoSession on the session's map; it makes blocking
+    #  requests, so call it on a worker thread
+    def openMap(self,accountName=""):
+        # imported here so that the window (or a headless run without a map)
+        #  does not wait for requests
+        from sartopo_python import SartopoSession
+        parse=self.url.replace("http://","").replace("https://","").split("/")
+        domainAndPort=parse[0]
+        mapID=parse[-1]
+        log.info("calling SartopoSession with domainAndPort="+domainAndPort+" mapID="+mapID)
+        if 'sartopo.com' in domainAndPort.lower():
+            sts=SartopoSession(domainAndPort=domainAndPort,mapID=mapID,
+                               configpath="../sts.ini",account=accountName,
+                               probeCacheFile=probeCacheFile)
+        else:
+            sts=SartopoSession(domainAndPort=domainAndPort,mapID=mapID,probeCacheFile=probeCacheFile)
+        # only these classes are looked up in the map cache; tracks, shapes
+        #  and the rest are skipped as the map state is read
+        sts.cacheClasses=["Folder","Marker","Assignment"]
+        sts.requestObserver=recordSartopoRequest
+        return sts
+
+    def close(self):
+        if self.tailer:
+            self.tailer.close()
+        if self.client:
+            self.client.close()
+        self.journal.close()
+        self.outbox.close()
@@ -0,0 +1,178 @@
+# #############################################################################
+#
+#  csv_tailer.py - incremental reader for a radiolog .csv file that is still
+#    being written, typically on a shared network drive.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  A CsvTailer keeps the file open between calls and remembers how far it has
+#   read, so a call when nothing was written costs a single stat.  New bytes
+#   are read in large chunks; only complete lines are parsed (with the csv
+#   module, so quoted fields containing commas are handled) and any partial
+#   last line is kept until the rest of it arrives.  If the file is replaced
+#   by a different file, reading starts over from the beginning; so it does
+#   if the file shrinks and does not grow back within rewriteGrace seconds
+#   (radiolog saves by truncating the file and writing it all again).
+#   Nothing may be written to a file that stays short, so the caller should
+#   read again once graceLeft() seconds have passed.
+#
+#  The offset is also verified: the tailer remembers the last few bytes
+#   before it, and whenever the file has been modified it checks that they
+#   are still there.  Appending leaves them alone; a rewrite that changed
+#   what was already read (radiolog saves by rewriting the whole file) does
+#   not, and reading starts over.  Lines read again after a restart are
+#   returned again, so the caller should recognise them (see
+#   RadioLogStore.newEntries).
+#
+#  The read offset is persisted to an offset file (same 'inode, offset' layout
+#   that pygtail uses, plus a line with the check bytes in hex) at
+#   checkpoints rather than on every read.
+#
+# #############################################################################
+
+import logging
+import os
+import io
+import csv
+import time
+
+log=logging.getLogger(__name__)
+
+class CsvTailer():
+    def __init__(self,fileName,offsetFileName=None,checkpointInterval=10,chunkSize=1<<20,encoding="utf-8"):
+        self.fileName=fileName
+        self.offsetFileName=offsetFileName
+        self.checkpointInterval=checkpointInterval
+        self.chunkSize=chunkSize
+        self.encoding=encoding
+        self.fid=None
+        self.inode=None
+        self.offset=0        # end of the last complete line that has been returned
+        self.pending=b""     # bytes read past offset that do not yet form a complete line
+        self.checkBytes=b""  # the bytes just before offset, as they were read
+        self.checkSize=64
+        self.mtime=None
+        self.shrunk=None     # when the file was first seen shorter than offset
+        self.rewriteGrace=1.0
+        self.lastCheckpoint=time.time()
+        self.dirty=False
+        self.readOffsetFile()
+
+    def readOffsetFile(self):
+        if self.offsetFileName and os.path.isfile(self.offsetFileName):
+            try:
+                with open(self.offsetFileName,'r') as f:
+                    tokens=f.read().split()
+                inode,offset=[int(x) for x in tokens[:2]]
+                checkBytes=bytes.fromhex(tokens[2]) if len(tokens)>2 else b""
+            except (OSError,ValueError):
+                log.warning("ignoring unreadable offset file "+self.offsetFileName)
+            else:
+                self.inode=inode
+                self.offset=offset
+                self.checkBytes=checkBytes
+
+    def checkpoint(self):
+        # write the offset file if anything was read since the last checkpoint
+        self.lastCheckpoint=time.time()
+        if not self.dirty or not self.offsetFileName:
+            return
+        try:
+            with open(self.offsetFileName,'w') as f:
+                f.write(str(self.inode or 0)+"\n"+str(self.offset)+"\n"+self.checkBytes.hex()+"\n")
+        except OSError as e:
+            log.warning("could not write offset file "+self.offsetFileName+": "+str(e))
+        else:
+            self.dirty=False
+
+    def restart(self):
+        # start over from the beginning of the (possibly new) file
+        self.close()
+        self.offset=0
+        self.pending=b""
+        self.checkBytes=b""
+        self.dirty=True
+
+    # graceLeft - seconds until a file seen shorter than the offset is read
+    #  from the beginning (0 if that is due); None if it is not short
+    def graceLeft(self):
+        if self.shrunk is None:
+            return None
+        return max(0.0,self.shrunk+self.rewriteGrace-time.time())
+
+    # verify - True if what was read up to offset is still in the file
+    def verify(self):
+        if not self.checkBytes:
+            return True
+        try:
+            if self.fid is None:
+                self.fid=open(self.fileName,'rb')
+            self.fid.seek(self.offset-len(self.checkBytes))
+            return self.fid.read(len(self.checkBytes))==self.checkBytes
+        except (OSError,ValueError):
+            return False
+
+    def readLines(self):
+        # return a list of parsed rows (lists of fields) for all complete lines
+        #  written since the previous call
+        try:
+            st=os.stat(self.fileName)
+        except OSError:
+            return []
+        if self.inode and st.st_ino and st.st_ino!=self.inode:
+            log.info("watched file was replaced; reading from the beginning")
+            self.restart()
+        elif st.st_size<self.offset:
+            # radiolog saves by truncating the file and writing it all again;
+            #  give it rewriteGrace seconds to get back past the offset
+            if self.shrunk is None:
+                self.shrunk=time.time()
+            if time.time()-self.shrunk<self.rewriteGrace:
+                return []
+            log.info("watched file was truncated; reading from the beginning")
+            self.restart()
+        elif st.st_mtime_ns!=self.mtime and not self.verify():
+            log.info("watched file was rewritten; reading from the beginning")
+            self.restart()
+        self.shrunk=None
+        self.inode=st.st_ino
+        self.mtime=st.st_mtime_ns
+        readPos=self.offset+len(self.pending)
+        if st.st_size<=readPos:
+            return []
+        if self.fid is None:
+            self.fid=open(self.fileName,'rb')
+        self.fid.seek(readPos)
+        chunks=[self.pending]
+        while True:
+            chunk=self.fid.read(self.chunkSize)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        data=b"".join(chunks)
+        end=data.rfind(b"\n")+1
+        # a quoted field may contain a newline; wait until it is complete
+        while end and data.count(b'"',0,end)%2:
+            end=data.rfind(b"\n",0,end-1)+1
+        self.pending=data[end:]
+        if not end:
+            return []
+        self.checkBytes=(self.checkBytes+data[max(0,end-self.checkSize):end])[-self.checkSize:]
+        self.offset+=end
+        self.dirty=True
+        text=data[:end].decode(self.encoding,errors="replace")
+        rows=[row for row in csv.reader(io.StringIO(text,newline="")) if row]
+        if time.time()-self.lastCheckpoint>=self.checkpointInterval:
+            self.checkpoint()
+        return rows
+
+    def close(self):
+        self.checkpoint()
+        if self.fid:
+            self.fid.close()
+            self.fid=None
@@ -0,0 +1,67 @@
+# #############################################################################
+#
+#  dir_index.py - cached listing of the radiolog .csv files in the watched
+#    directory, newest first.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  The directory is listed with a single os.scandir pass (on Windows the
+#   size and modification time come back with the listing, so no per-file
+#   stat goes over the network).  The result is kept between scans: if the
+#   directory's own modification time has not changed the cached list is
+#   returned as is, and otherwise only files that were not seen before are
+#   stat'ed.  scan(force=True) re-stats everything.
+#
+# #############################################################################
+
+import logging
+import os
+import re
+
+log=logging.getLogger(__name__)
+
+# radiolog writes these alongside the main log; they are never the log itself.
+#  Case does not matter, as for the .csv extension
+excludePattern=re.compile(r'.*_(clueLog|fleetsync|bak[1-9])\.csv$',re.IGNORECASE)
+
+class CsvDirIndex():
+    def __init__(self,dirName):
+        self.dirName=dirName
+        self.dirMtime=None
+        self.entries={}   # file name: [path,size,mtime]
+        self.files=[]     # entries sorted by mtime, newest first
+
+    def scan(self,force=False):
+        # return a list of [path,size,mtime] of the candidate csv files,
+        #  most recently modified first
+        try:
+            dirMtime=os.stat(self.dirName).st_mtime_ns
+        except OSError as e:
+            log.warning("cannot read directory "+self.dirName+": "+str(e))
+            return []
+        if not force and dirMtime==self.dirMtime:
+            return [list(f) for f in self.files]
+        seen=set()
+        with os.scandir(self.dirName) as it:
+            for entry in it:
+                name=entry.name
+                if not name.lower().endswith(".csv") or excludePattern.match(name):
+                    continue
+                seen.add(name)
+                if force or name not in self.entries:
+                    try:
+                        st=entry.stat()
+                    except OSError:
+                        continue
+                    self.entries[name]=[entry.path,st.st_size,st.st_mtime]
+        for name in list(self.entries):
+            if name not in seen:
+                del self.entries[name]
+        self.dirMtime=dirMtime
+        self.files=sorted(self.entries.values(),key=lambda f:f[2],reverse=True)
+        return [list(f) for f in self.files]
@@ -0,0 +1,110 @@
+# #############################################################################
+#
+#  file_notifier.py - tell plans_console when a watched file or directory
+#    has changed, instead of having it re-read on a fixed timer.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Change notifications come from QFileSystemWatcher (inotify, kqueue or
+#   ReadDirectoryChangesW underneath) where the platform supports it.  Those
+#   are not reliable on every network share, so a stat-polling fallback runs
+#   alongside: it polls quickly right after a change and backs off while the
+#   file is idle, up to maxInterval.  Once the watcher has proven that it
+#   delivers notifications for this path the fallback relaxes to
+#   trustedInterval, and only acts as a safety net.
+#
+# #############################################################################
+
+import logging
+import os
+
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+log=logging.getLogger(__name__)
+
+class FileChangeNotifier(QObject):
+    changed=pyqtSignal()
+
+    def __init__(self,parent=None,useWatcher=True,minInterval=250,maxInterval=3000,trustedInterval=30000):
+        QObject.__init__(self,parent)
+        self.path=None
+        self.minInterval=minInterval
+        self.maxInterval=maxInterval
+        self.trustedInterval=trustedInterval
+        self.interval=minInterval
+        self.watcherTrusted=False
+        self.lastStat=None
+        self.watcher=None
+        if useWatcher:
+            self.watcher=QFileSystemWatcher(self)
+            self.watcher.fileChanged.connect(self.watcherNotified)
+            self.watcher.directoryChanged.connect(self.watcherNotified)
+        self.pollTimer=QTimer(self)
+        self.pollTimer.setSingleShot(True)
+        self.pollTimer.timeout.connect(self.poll)
+        # several notifications for one write collapse into one 'changed'
+        self.debounceTimer=QTimer(self)
+        self.debounceTimer.setSingleShot(True)
+        self.debounceTimer.setInterval(50)
+        self.debounceTimer.timeout.connect(self.changed)
+
+    def watch(self,path):
+        self.stop()
+        self.path=path
+        self.watcherTrusted=False
+        self.lastStat=self.statPath()
+        if self.watcher is not None:
+            self.watcher.addPath(path)
+        self.interval=self.minInterval
+        self.pollTimer.start(self.interval)
+
+    def stop(self):
+        self.pollTimer.stop()
+        self.debounceTimer.stop()
+        if self.watcher is not None and self.path:
+            self.watcher.removePath(self.path)
+        self.path=None
+
+    def statPath(self):
+        try:
+            st=os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_size,st.st_mtime_ns,st.st_ino)
+
+    def notify(self):
+        self.interval=self.minInterval
+        if not self.debounceTimer.isActive():
+            self.debounceTimer.start()
+
+    def watcherNotified(self,path):
+        if path!=self.path:
+            return
+        # a file that was replaced drops out of the watcher; put it back
+        if self.watcher is not None and path not in self.watcher.files()+self.watcher.directories():
+            self.watcher.addPath(path)
+        self.lastStat=self.statPath()
+        self.watcherTrusted=True
+        self.notify()
+        self.pollTimer.start(self.trustedInterval)
+
+    def poll(self):
+        if not self.path:
+            return
+        st=self.statPath()
+        if st!=self.lastStat:
+            self.lastStat=st
+            if self.watcherTrusted:
+                log.warning("change notification was missed for "+self.path+"; polling again")
+                self.watcherTrusted=False
+            self.notify()
+        elif self.watcherTrusted:
+            self.interval=self.trustedInterval
+        else:
+            self.interval=min(self.interval*2,self.maxInterval)
+        self.pollTimer.start(self.interval)
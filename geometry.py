@@ -0,0 +1,157 @@
+# #############################################################################
+#
+#  geometry.py - where to put team markers in assignment shapes
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Coordinates are [lon,lat] as in GeoJSON; locations handed back to
+#   plans_console are [lat,lon].  Assignments are small enough that treating
+#   degrees as planar (with longitude scaled by cos(lat) where distances
+#   matter) is accurate to well under a marker's width.
+#
+#  polygonCentroids works on many polygons at once: all rings are stacked
+#   into one array and the per-ring shoelace sums are taken with
+#   np.add.reduceat, so refreshing every assignment on the map is a handful
+#   of NumPy calls rather than a Python loop over vertices.
+#
+# #############################################################################
+
+import math
+
+import numpy as np
+
+# golden angle, for spreading markers on a sunflower spiral
+goldenAngle=math.pi*(3-math.sqrt(5))
+
+def ringArray(ring):
+    # closed ring as an (n,2) float array; the closing point is dropped
+    a=np.asarray(ring,dtype=float)[:,:2]
+    if len(a)>1 and (a[0]==a[-1]).all():
+        a=a[:-1]
+    return a
+
+# polygonCentroids - area-weighted centroids of a list of rings, as an (n,2)
+#  [lon,lat] array.  A degenerate ring (no area) gets its vertex average.
+def polygonCentroids(rings):
+    rings=[ringArray(r) for r in rings]
+    if not rings:
+        return np.zeros((0,2))
+    lengths=np.array([len(r) for r in rings])
+    starts=np.concatenate(([0],np.cumsum(lengths)[:-1]))
+    p=np.concatenate(rings)
+    # the next vertex of each vertex, wrapping within its own ring
+    nxt=np.arange(len(p))+1
+    nxt[starts+lengths-1]=starts
+    q=p[nxt]
+    # shift each ring to its first vertex to keep the products small
+    first=p[starts]
+    origin=np.repeat(first,lengths,axis=0)
+    p=p-origin
+    q=q-origin
+    cross=p[:,0]*q[:,1]-q[:,0]*p[:,1]
+    area=np.add.reduceat(cross,starts)/2
+    cx=np.add.reduceat((p[:,0]+q[:,0])*cross,starts)
+    cy=np.add.reduceat((p[:,1]+q[:,1])*cross,starts)
+    mean=np.add.reduceat(p,starts)/lengths[:,None]
+    with np.errstate(divide='ignore',invalid='ignore'):
+        c=np.column_stack((cx,cy))/(6*area[:,None])
+    flat=np.abs(area)<1e-15
+    c[flat]=mean[flat]
+    return c+first
+
+# pointsInPolygon - boolean array, for each [lon,lat] point, of whether it
+#  is inside the ring (even-odd rule)
+def pointsInPolygon(points,ring):
+    pts=np.atleast_2d(np.asarray(points,dtype=float))
+    r=ringArray(ring)
+    x,y=pts[:,0][:,None],pts[:,1][:,None]
+    x1,y1=r[:,0][None,:],r[:,1][None,:]
+    x2,y2=np.roll(r[:,0],-1)[None,:],np.roll(r[:,1],-1)[None,:]
+    crosses=(y1>y)!=(y2>y)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        xint=x1+(y-y1)*(x2-x1)/(y2-y1)
+    return np.logical_and(crosses,x<xint).sum(axis=1)%2==1
+
+# interiorPoint - a point inside the ring near its centroid: the centroid
+#  itself if it is inside (the usual case), otherwise the middle of the
+#  widest inside span of the horizontal line through the centroid
+def interiorPoint(ring,centroid=None):
+    r=ringArray(ring)
+    if centroid is None:
+        centroid=polygonCentroids([r])[0]
+    if pointsInPolygon(centroid,r)[0]:
+        return np.asarray(centroid,dtype=float)
+    for y in [centroid[1],(r[:,1].min()+r[:,1].max())/2]:
+        x1,y1=r[:,0],r[:,1]
+        x2,y2=np.roll(x1,-1),np.roll(y1,-1)
+        crosses=(y1>y)!=(y2>y)
+        xs=np.sort(x1[crosses]+(y-y1[crosses])*(x2[crosses]-x1[crosses])/(y2[crosses]-y1[crosses]))
+        if len(xs)>=2:
+            spans=xs[1::2]-xs[0:len(xs)-1:2]
+            i=int(np.argmax(spans))
+            return np.array([(xs[2*i]+xs[2*i+1])/2,y])
+    return r.mean(axis=0)
+
+# lineMidpoint - the point half way along a line, by length
+def lineMidpoint(line):
+    a=np.asarray(line,dtype=float)[:,:2]
+    if len(a)<2:
+        return a[0]
+    seg=np.hypot(*np.diff(a,axis=0).T)
+    cum=np.concatenate(([0],np.cumsum(seg)))
+    if cum[-1]==0:
+        return a[0]
+    half=cum[-1]/2
+    i=min(int(np.searchsorted(cum,half,side='right'))-1,len(seg)-1)
+    t=(half-cum[i])/seg[i]
+    return a[i]+t*(a[i+1]-a[i])
+
+# markerLocations - [lat,lon] for a team marker in each geometry (None for a
+#  geometry without coordinates): an interior label point of a polygon, or
+#  the midpoint of a line.  Polygon centroids are computed in one batch.
+def markerLocations(geometries):
+    locs=[None]*len(geometries)
+    polys=[]
+    for i,g in enumerate(geometries):
+        coords=(g or {}).get("coordinates")
+        if not coords:
+            continue
+        if type(coords[0][0]) is list:    # polygon is list of rings; use the outer one
+            if len(coords[0])>=3:
+                polys.append((i,coords[0]))
+        else:
+            lon,lat=lineMidpoint(coords)
+            locs[i]=[float(lat),float(lon)]
+    if polys:
+        centroids=polygonCentroids([ring for i,ring in polys])
+        for (i,ring),c in zip(polys,centroids):
+            lon,lat=interiorPoint(ring,c)
+            locs[i]=[float(lat),float(lon)]
+    return locs
+
+# spreadLocations - n distinct [lat,lon] locations around center ([lat,lon])
+#  so that several team markers in one place do not cover each other.  They
+#  lie on a sunflower spiral about spacing degrees apart; slot 0 is the
+#  center itself.  If ring is given, spiral points outside it are skipped.
+#  The result depends only on the arguments.
+def spreadLocations(center,n,ring=None,spacing=0.0005,first=0):
+    lat,lon=center
+    total=first+n
+    candidates=max(4*total,total+16)
+    k=np.arange(candidates)
+    rad=spacing*np.sqrt(k)
+    ang=k*goldenAngle
+    scale=1/max(math.cos(math.radians(lat)),0.01)   # longitude degrees are shorter
+    pts=np.column_stack((lon+rad*np.cos(ang)*scale,lat+rad*np.sin(ang)))
+    if ring is not None:
+        inside=pointsInPolygon(pts,ring)
+        inside[0]=True    # the center is already an interior point
+        pts=pts[inside]
+    if len(pts)<total:    # a very small shape: fall back to the plain spiral
+        pts=np.column_stack((lon+rad*np.cos(ang)*scale,lat+rad*np.sin(ang)))
+    return [[float(p[1]),float(p[0])] for p in pts[first:total]]
@@ -0,0 +1,152 @@
+# #############################################################################
+#
+#  json_stream.py - read the items of one array inside a large JSON document
+#    as the document arrives, without holding all of it in memory
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  A sartopo since/<t> response is one JSON object whose bulk is the list
+#   result.state.features.  JsonArrayStream walks the objects along that
+#   path key by key and decodes the array one item at a time with
+#   json.JSONDecoder.raw_decode, reading more of the response only when an
+#   item is incomplete.  Each item can be dropped as soon as the caller has
+#   looked at it.  Every other member on the way (result.timestamp,
+#   result.ids, status ...) is decoded whole and kept in 'values', by
+#   dotted path, once iteration has finished.
+#
+#     stream=JsonArrayStream(r.iter_content(65536),("result","state","features"))
+#     for feature in stream:
+#         ...
+#     timestamp=stream.values.get("result.timestamp")
+#
+#  close, if given, is called by close() (or on leaving a with block), e.g.
+#   to release the streamed HTTP response however far it was read.
+#
+# #############################################################################
+
+import json
+import codecs
+
+class JsonArrayStream():
+    def __init__(self,chunks,path,encoding="utf-8",close=None):
+        self.chunks=iter(chunks)
+        self.onClose=close
+        self.path=tuple(path)
+        self.decoder=json.JSONDecoder()
+        self.textDecoder=codecs.getincrementaldecoder(encoding)()
+        self.buf=""
+        self.pos=0
+        self.eof=False
+        self.values={}      # members not on the path, by dotted path
+        self.found=False    # True if the array was there
+
+    def close(self):
+        if self.onClose:
+            self.onClose()
+            self.onClose=None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+    def read(self,atLeast=1):
+        # append at least atLeast more characters to the buffer (unless the
+        #  input ends first); drop what has already been consumed
+        self.buf=self.buf[self.pos:]
+        self.pos=0
+        parts=[self.buf]
+        got=0
+        while got<atLeast and not self.eof:
+            try:
+                chunk=next(self.chunks)
+            except StopIteration:
+                self.eof=True
+                chunk=self.textDecoder.decode(b"",final=True)
+            else:
+                chunk=self.textDecoder.decode(chunk) if isinstance(chunk,bytes) else chunk
+            parts.append(chunk)
+            got+=len(chunk)
+        self.buf="".join(parts)
+        return got>0
+
+    def peek(self):
+        # next significant character, or "" at the end of the input
+        while True:
+            while self.pos<len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos+=1
+            if self.pos<len(self.buf):
+                return self.buf[self.pos]
+            if not self.read():
+                return ""
+
+    def expect(self,chars):
+        c=self.peek()
+        if c=="" or c not in chars:
+            raise ValueError("expected "+repr(chars)+" at offset "+str(self.pos)+", found "+repr(c))
+        self.pos+=1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                val,end=self.decoder.raw_decode(self.buf,self.pos)
+            except json.JSONDecodeError:
+                # incomplete; read at least as much again as is buffered, so a
+                #  large value is re-scanned only a few times
+                if self.eof:
+                    raise
+                self.read(max(len(self.buf)-self.pos,65536))
+                continue
+            # a number at the very end of the buffer may continue in the next chunk
+            if end==len(self.buf) and not self.eof and not isinstance(val,(dict,list,str)):
+                self.read()
+                continue
+            self.pos=end
+            return val
+
+    def __iter__(self):
+        return self.member(0,"")
+
+    def member(self,depth,prefix):
+        # walk one object on the path; depth is the index in self.path
+        if self.peek()!="{":
+            self.values[prefix.rstrip(".")]=self.value()
+            return
+        self.pos+=1
+        if self.peek()=="}":
+            self.pos+=1
+            return
+        while True:
+            key=self.value()
+            self.expect(":")
+            if key==self.path[depth]:
+                if depth==len(self.path)-1:
+                    yield from self.items(prefix+key)
+                else:
+                    yield from self.member(depth+1,prefix+key+".")
+            else:
+                self.values[prefix+key]=self.value()
+            if self.expect(",}")=="}":
+                return
+
+    def items(self,name):
+        if self.peek()!="[":
+            self.values[name]=self.value()
+            return
+        self.found=True
+        self.pos+=1
+        if self.peek()=="]":
+            self.pos+=1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]")=="]":
+                return
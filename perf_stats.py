@@ -0,0 +1,108 @@
+# #############################################################################
+#
+#  perf_stats.py - timers and counters for plans_console's busy paths
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  A timer keeps its most recent samples (durations in seconds), so p50 and
+#   p99 are over recent activity; a counter keeps timestamped increments for
+#   the last minute, so it can report a rate.  Recording is a lock, an
+#   append and (for timers) a perf_counter call, cheap enough to leave on.
+#
+#     with stats.timer("tail read"):
+#         lines=tailer.readLines()
+#     stats.count("rows",len(lines))
+#     stats.snapshot()  ->  {"timers":{name:{...}},"counters":{name:{...}}}
+#
+#  'stats' is the instance the application records into; worker threads
+#   record into it too.
+#
+# #############################################################################
+
+import time
+import threading
+import collections
+import contextlib
+
+class PerfStats():
+    def __init__(self,samples=1000,window=60.0):
+        self.samples=samples
+        self.window=window      # seconds over which counter rates are taken
+        self.lock=threading.Lock()
+        self.timers={}          # name: [count,total,max,deque of recent samples]
+        self.counters={}        # name: [total,deque of (time,n)]
+
+    @contextlib.contextmanager
+    def timer(self,name):
+        t0=time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name,time.perf_counter()-t0)
+
+    def record(self,name,seconds):
+        with self.lock:
+            t=self.timers.get(name)
+            if t is None:
+                t=self.timers[name]=[0,0.0,0.0,collections.deque(maxlen=self.samples)]
+            t[0]+=1
+            t[1]+=seconds
+            t[2]=max(t[2],seconds)
+            t[3].append(seconds)
+
+    def count(self,name,n=1):
+        now=time.monotonic()
+        with self.lock:
+            c=self.counters.get(name)
+            if c is None:
+                c=self.counters[name]=[0,collections.deque()]
+            c[0]+=n
+            c[1].append((now,n))
+            while c[1] and c[1][0][0]<now-self.window:
+                c[1].popleft()
+
+    def snapshot(self):
+        now=time.monotonic()
+        with self.lock:
+            timers={name:(t[0],t[1],t[2],sorted(t[3])) for name,t in self.timers.items()}
+            counters={}
+            for name,(total,recent) in self.counters.items():
+                while recent and recent[0][0]<now-self.window:
+                    recent.popleft()
+                counters[name]=(total,sum(n for t,n in recent))
+        rval={"timers":{},"counters":{}}
+        for name,(count,total,maxTime,recent) in timers.items():
+            rval["timers"][name]={"count":count,"mean":total/count if count else 0.0,"max":maxTime,
+                                  "p50":percentile(recent,50),"p99":percentile(recent,99)}
+        for name,(total,inWindow) in counters.items():
+            rval["counters"][name]={"total":total,"perMinute":inWindow*60.0/self.window,
+                                    "perSecond":inWindow/self.window}
+        return rval
+
+    def reset(self):
+        with self.lock:
+            self.timers={}
+            self.counters={}
+
+    # summary - one line per timer and counter, for the log
+    def summary(self):
+        snap=self.snapshot()
+        lines=[]
+        for name,t in sorted(snap["timers"].items()):
+            lines.append("%s: n=%d p50=%.1fms p99=%.1fms max=%.1fms"%(name,t["count"],
+                         1000*t["p50"],1000*t["p99"],1000*t["max"]))
+        for name,c in sorted(snap["counters"].items()):
+            lines.append("%s: total=%d %.1f/min"%(name,c["total"],c["perMinute"]))
+        return lines
+
+def percentile(sortedValues,p):
+    if not sortedValues:
+        return 0.0
+    return sortedValues[min(len(sortedValues)-1,int(p/100*len(sortedValues)))]
+
+stats=PerfStats()
@@ -34,25 +34,33 @@
 # ############################################################################
 #
 
-from PyQt5 import QtCore, QtGui, QtWidgets
-from PyQt5.QtCore import *
-from PyQt5.QtGui import *
-from PyQt5.QtWidgets import *
+from PyQt5.QtCore import Qt, QTimer, QFile, QTextStream
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import (QApplication, QDialog, QMessageBox, QShortcut, QTableWidgetItem,
+                             QWidget, QHBoxLayout, QLabel, QLineEdit, QPushButton)
 
-from pygtail import Pygtail
 import sys
 import os
 import shutil
-import glob
-import regex
 import time
 import io
+import queue
 import traceback
-import json
-import random
+import logging
 
 from plans_console_ui import Ui_MainWindow
-from datetime import datetime
+from radiolog_model import RadioLogModel
+from radiolog_index import RadioLogIndex, tokens
+from console_session import ConsoleSession, mapUrl, readConfig
+from file_notifier import FileChangeNotifier
+from sartopo_worker import SartopoWorker
+from assignment_index import AssignmentIndex
+from perf_stats import stats
+
+# the sartopo session (requests), the marker geometry (numpy) and the csv
+#  tailing code are imported where they are first used, so that the window
+#  comes up without waiting for them; sartopo_python is first imported on
+#  the worker thread
 
 sartopo_python_min_version="1.1.2"
 
@@ -63,8 +71,6 @@ sartopo_python_min_version="1.1.2"
 #    print("ABORTING: installed sartopo_python version "+str(sartopo_python_installed_version)+ \
 #          " is less than minimum required version "+sartopo_python_min_version)
 #    exit()
-    
-from sartopo_python import SartopoSession
 
 statusColorDict={}
 statusColorDict["At IC"]=["22ff22","000000"]
@@ -72,11 +78,10 @@ statusColorDict["Available"]=["00ffff","000000"]
 statusColorDict["In Transit"]=["2222ff","eeeeee"]
 statusColorDict["Waiting for Transport"]=["2222ff","eeeeee"]
 
-stateColorDict={}
-stateColorDict["#ff4444"]="#eeeeee"
-stateColorDict["#eeeeee"]="#ff4444"
 sys.tracebacklimit = 1000
 
+log=logging.getLogger("plans_console")
+
 
 ### handler for intercepting exceptions
 def excepthook(excType, excValue, tracebackobj):
@@ -123,6 +128,8 @@ class MainWindow(QDialog,Ui_MainWindow):
         self.configFileName="./local/plans_console.cfg"
         self.accountName=""
         self.readConfigFile()
+        if isinstance(logging.getLevelName(self.logLevel),int):
+            logging.getLogger().setLevel(self.logLevel)
         if not os.path.isdir(self.watchedDir):
             err=QMessageBox(QMessageBox.Critical,"Error","Specified directory to be watched does not exist:\n \n  "+self.watchedDir+"\n \nAborting.",
                             QMessageBox.Close,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
@@ -137,25 +144,32 @@ class MainWindow(QDialog,Ui_MainWindow):
         self.medval = ""
         self.save_mod_date = 0
         self.assignments = []
-        self.forceRescan = 0
-        self.feature = {}
+        self.assignment = None
+        self.assignmentIndex = AssignmentIndex()
         self.feature2 = {}
         self.setStyleSheet("background-color:#d6d6d6")
-        self.ui.tableWidget.cellClicked.connect(self.tableCellClicked)        
+        # the session itself - radiolog rows, teams, journal and map outbox -
+        #  is the same ConsoleSession that plans_console_headless runs
+        self.session=ConsoleSession(self.watchedDir)
+        self.radioLogStore=self.session.store
+        self.journal=self.session.journal
+        self.outbox=self.session.outbox
+        self.radioLogModel=RadioLogModel(self.radioLogStore,self)
+        self.ui.tableView.setModel(self.radioLogModel)
+        self.radioLogIndex=RadioLogIndex(self.radioLogStore)
+        self.teamStatus=self.session.teamStatus
+        self.indexQueued=False
+        for col,width in enumerate([100,100,700,150]):
+            self.ui.tableView.setColumnWidth(col,width)
+        self.ui.tableView.clicked.connect(self.tableCellClicked)
         self.ui.OKbut.clicked.connect(self.assignTab_OK_clicked)
+        self.restoring = False
         self.reloaded = 0
-        name1, done1 = QtWidgets.QInputDialog.getText(self, 'Input Dialog','Should the session be restored?')
-        if "y" in name1.lower():
-            self.load_data()
-            self.reloaded = 1
-        else:    
-            name1, done1 = QtWidgets.QInputDialog.getText(self, 'Input Dialog','Enter the map URL, precede with # if at sartopo.com')                                              
-            if "#" in name1:
-                self.url="sartopo.com/m/"+name1[1:]  # remove the #
-            else:    
-                self.url="localhost:8080/m/"+name1
+        self.serverTimer = None     # reads the session from plans_console_headless (connectServer)
+        self.rereadQueued = False
         self.folderId=None
         self.sts=None
+        self.teamMarkers=None
         self.link=-1
         self.latField = "0.0"
         self.lonField = "0.0"
@@ -176,18 +190,16 @@ class MainWindow(QDialog,Ui_MainWindow):
         self.curTeam = ""
         self.curAssign = ""
         self.curType = ""
-        self.totalRows = 0
         self.x = self.xd
         self.y = self.yd
         self.w = self.wd
         self.h = self.hd
-        self.color = ["#ffff00", "#cccccc"]
                      
         self.loadRcFile()
         self.setGeometry(int(self.x),int(self.y),int(self.w),int(self.h))
         self.scl = min(self.w/self.wd, self.h/self.hd)
         self.fontSize = int(self.fontSize*self.scl)
-        print("Scale:"+str(self.scl))
+        log.debug("Scale:"+str(self.scl))
         
         
         self.updateClock()
@@ -196,21 +208,27 @@ class MainWindow(QDialog,Ui_MainWindow):
                     QMessageBox.Abort,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
         self.ui.notYet.setStyleSheet("background-color: lightgray")
         self.ui.notYet.setModal(False)
-        self.ui.notYet.show()
         self.ui.notYet.buttonClicked.connect(self.notYetButtonClicked)
         self.ui.rescanButton.clicked.connect(self.rescanButtonClicked)
 
-        self.rescanTimer=QTimer(self)
-        self.rescanTimer.timeout.connect(self.rescan)
-        if self.reloaded == 0:
-            self.rescanTimer.start(2000)     # do not start rescan timer if this is a reload
-        else:
-            self.ui.notYet.close()           # we have csv file in reload
+        # rescan when the watched directory changes, until a csv file is found;
+        #  after that, refresh when the csv file changes
+        useWatcher = self.watchMode != "poll"
+        self.dirNotifier=FileChangeNotifier(self,useWatcher=useWatcher)
+        self.dirNotifier.changed.connect(self.rescan)
+        self.fileNotifier=FileChangeNotifier(self,useWatcher=useWatcher)
+        self.fileNotifier.changed.connect(self.refresh)
                   
-        self.refreshTimer=QTimer(self)
-        self.refreshTimer.timeout.connect(self.refresh)
-        self.refreshTimer.timeout.connect(self.updateClock)
-        self.refreshTimer.start(3000)
+        self.clockTimer=QTimer(self)
+        self.clockTimer.timeout.connect(self.updateClock)
+        self.clockTimer.start(3000)
+
+        self.statsPanelWindow=None
+        QShortcut(QKeySequence(Qt.Key_F2),self,self.toggleStatsPanel)
+        if self.statsPanel:
+            QTimer.singleShot(0,self.toggleStatsPanel)
+        self.teamStatusPanelWindow=None
+        QShortcut(QKeySequence(Qt.Key_F3),self,self.toggleTeamStatusPanel)
 
         self.since={}
         self.since["Folder"]=0
@@ -220,82 +238,234 @@ class MainWindow(QDialog,Ui_MainWindow):
         self.featureListDict["Folder"]=[]
         self.featureListDict["Marker"]=[]
 
-        self.createSTS()
-        
-    def createSTS(self):
+        # all requests to sartopo run here, in order, starting with creating
+        #  the session
+        self.worker=SartopoWorker(self)
+        # marker changes go through the session's durable outbox, so they
+        #  survive the map being unreachable; it is flushed on the worker thread
+        self.flushQueued=False
+        self.flushDelay=500     # ms; lets rapid changes for a team coalesce
+        self.flushTimer=QTimer(self)
+        self.flushTimer.setSingleShot(True)
+        self.flushTimer.timeout.connect(self.scheduleFlush)
+        # assignments are looked up locally; the index is refreshed in the
+        #  background, and right away when a letter is not found
+        self.assignmentTimer=QTimer(self)
+        self.assignmentTimer.timeout.connect(self.refreshAssignments)
+
+        # the session (restore, or a new one on a given map) is chosen in
+        #  the bar above the table; nothing is read or sent until then
+        self.buildSearchBar()
+        self.enableSessionControls(False)
+        self.buildSessionBar()
 
-            parse=self.url.replace("http://","").replace("https://","").split("/")
-            domainAndPort=parse[0]
-            mapID=parse[-1]
-            print("calling SartopoSession with domainAndPort="+domainAndPort+" mapID="+mapID)
-            if 'sartopo.com' in domainAndPort.lower():
-                self.sts=SartopoSession(domainAndPort=domainAndPort,mapID=mapID,
-                                        configpath="../sts.ini",
-                                        account=self.accountName)
+    # buildSessionBar - the restore / new session choice, shown in the
+    #  window rather than as prompts so that the window comes up at once
+    def buildSessionBar(self):
+        self.sessionBar=QWidget(self)
+        self.sessionBar.setGeometry(10,5,1115,32)
+        layout=QHBoxLayout(self.sessionBar)
+        layout.setContentsMargins(0,0,0,0)
+        layout.addWidget(QLabel("Map ID (precede with # if at sartopo.com), or map URL:"))
+        self.mapEdit=QLineEdit()
+        layout.addWidget(self.mapEdit,1)
+        self.newSessionButton=QPushButton("New session")
+        self.newSessionButton.clicked.connect(lambda: self.newSession(self.mapEdit.text()))
+        self.mapEdit.returnPressed.connect(self.newSessionButton.click)
+        layout.addWidget(self.newSessionButton)
+        self.restoreSessionButton=QPushButton("Restore session")
+        self.restoreSessionButton.clicked.connect(self.restoreSession)
+        layout.addWidget(self.restoreSessionButton)
+        self.restoreSessionButton.setEnabled(os.path.isfile(self.journal.snapshotFileName) or
+                                             os.path.isfile(self.journal.journalFileName))
+        if self.server:
+            self.connectServerButton=QPushButton("Connect to server")
+            self.connectServerButton.setToolTip("show the session kept by plans_console_headless at "+self.server)
+            self.connectServerButton.clicked.connect(self.connectServer)
+            layout.addWidget(self.connectServerButton)
+        self.mapEdit.setFocus()
+
+    # buildSearchBar - the radiolog search box; it takes the place of the
+    #  session bar once the session has started
+    def buildSearchBar(self):
+        self.searchBar=QWidget(self)
+        self.searchBar.setGeometry(10,5,1115,32)
+        layout=QHBoxLayout(self.searchBar)
+        layout.setContentsMargins(0,0,0,0)
+        layout.addWidget(QLabel("Search:"))
+        self.searchEdit=QLineEdit()
+        self.searchEdit.setPlaceholderText("team, message or status words; the last word can be partial")
+        self.searchEdit.setClearButtonEnabled(True)
+        self.searchEdit.textChanged.connect(self.searchChanged)
+        layout.addWidget(self.searchEdit,1)
+        self.searchCount=QLabel()
+        layout.addWidget(self.searchCount)
+        self.searchBar.hide()
+        QShortcut(QKeySequence.Find,self,self.searchEdit.setFocus)
+
+    # searchChanged - filter the radiolog table on every keystroke
+    def searchChanged(self,text):
+        with stats.timer("search"):
+            if tokens(text):
+                self.radioLogModel.setFilter(lambda start: self.radioLogIndex.search(text,start))
             else:
-                self.sts=SartopoSession(domainAndPort=domainAndPort,mapID=mapID)
-            self.link=self.sts.apiVersion
-            if self.link == -1:
-               self.urlErrMsgBox=QMessageBox(QMessageBox.Warning,"Error","Invalid URL",
-                             QMessageBox.Ok,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
-               self.urlErrMsgBox.exec_()
-               exit(-1)
-            print("link status:"+str(self.link))
-    
-    
-    def addMarker(self):
-        folders=self.sts.getFeatures("Folder")
-        fid=False
-        for folder in folders:
-            if folder["properties"]["title"]=="aTEAMS":
-                fid=folder["id"]
-        if not fid:
-            fid=self.sts.addFolder("aTEAMS")
-        self.folderId=fid
-        ## icons
-        if self.medval == " X":
-            markr = "ncssar-9"     # medical +
-            clr = "FF0000"
-        elif self.curType == "LE": # law enforcement
-            markr = "ncssar-5"     # red dot with blue circle
-            clr = "FF0000"           
+                self.radioLogModel.setFilter(None)
+        self.updateSearchCount()
+
+    def updateSearchCount(self):
+        if self.radioLogModel.matcher is None:
+            self.searchCount.setText("")
         else:
-            markr = "usar-1"       # default 
-            clr = "FFFF00"
-        print("In addMarker:"+self.curTeam)    
-        rval=self.sts.addMarker(self.latField,self.lonField,self.curTeam, \
-                                self.curAssign,clr,markr,None,self.folderId)
-    
-    def delMarker(self):
-        rval = self.sts.getFeatures("Folder",0)     # get Folders
-        ##print("Folders:"+json.dumps(rval))
-        fid = None
-        for self.feature2 in rval:
-            if self.feature2['properties'].get("title") == 'aTEAMS':   # find aTeams Match                
-                fid=self.feature2.get("id")
-                rval2 = self.sts.getFeatures("Marker",0)
-                print("title:"+str(fid))
-                ##print("Marker:"+json.dumps(rval2))                  
-                # get Markers
-                for self.feature2 in rval2:
-                    if self.feature2['properties'].get('folderId') == fid and \
-                        self.feature2['properties'].get('title') == self.curTeam: # both folder and Team match
-                            print("Marker ID:"+self.feature2['id']+" of team: "+self.curTeam)
-                            rval3 = self.sts.delMarker(self.feature2['id'])
-                            break
-        ##print("RestDel:"+json.dumps(rval3,indent=2))
-              
+            self.searchCount.setText("%d of %d rows"%(self.radioLogModel.shownCount(),len(self.radioLogStore)))
+
+    # scheduleIndex - bring the search index up to date a slice at a time
+    #  from the event loop, so that neither a long restore nor the first
+    #  search holds up the UI; a search indexes whatever is left right away
+    def scheduleIndex(self):
+        if not self.indexQueued:
+            self.indexQueued=True
+            QTimer.singleShot(0,self.indexRows)
+
+    def indexRows(self):
+        self.indexQueued=False
+        with stats.timer("index"):
+            left=self.radioLogIndex.update(limit=2000)
+        if left:
+            self.scheduleIndex()
+        else:
+            # not used here: a preload, so that the first search (which uses
+            #  numpy) does not stop to import it
+            import numpy
+
+    # enableSessionControls - the team entry and rescan controls write to the
+    #  session journal and queue map operations, so they are only enabled
+    #  once a session has been started or fully restored
+    def enableSessionControls(self,enabled):
+        for widget in [self.ui.Team,self.ui.Assign,self.ui.comboBox,self.ui.Med,
+                       self.ui.OKbut,self.ui.rescanButton]:
+            widget.setEnabled(enabled)
+
+    def newSession(self,map):
+        url=mapUrl(map)
+        if not url:
+            self.mapEdit.setFocus()
+            return
+        self.sessionBar.hide()
+        self.searchBar.show()
+        self.session.start(url)
+        self.ui.notYet.show()
+        self.dirNotifier.watch(self.watchedDir)
+        QTimer.singleShot(0,self.rescan)
+        self.startSartopo()
+        self.enableSessionControls(True)
+
+    def restoreSession(self):
+        self.sessionBar.hide()
+        self.searchBar.show()
+        self.load_data()      # we have csv file in reload
+        self.reloaded = 1
+        self.startSartopo()
+
+    # startSartopo - connect to the map on the worker thread; the radiolog is
+    #  read meanwhile, and map operations wait in the outbox until then
+    def startSartopo(self):
+        if self.session.client is None:
+            self.outbox.setMap(self.session.url)    # operations queued for other maps stay out of this session
+        if not self.session.url:
+            log.warning("no map in the session; map operations stay queued")
+            return
+        self.worker.submit(self.createSTS,callback=self.stsCreated)
+        self.refreshAssignments()
+        self.assignmentTimer.start(30000)
+
+    # createSTS runs on the worker thread.  As a client of plans_console_headless
+    #  the map is only read (assignments); the server sends the map operations
+    def createSTS(self):
+            from team_markers import TeamMarkers
+            sts=self.session.openMap(self.accountName)
+            if self.session.client is None:
+                self.teamMarkers=TeamMarkers(sts,self.outbox)
+            self.sts=sts
+            return sts.apiVersion
+
+    def stsCreated(self,link):
+            self.link=link
+            if self.sts and not self.sts.isValid():
+               self.urlErrMsgBox=QMessageBox(QMessageBox.Warning,"Error","Can not use the map at "+self.session.url+":\n\n"+self.sts.invalidReason+
+                             "\n\nMarker changes will be queued but not sent.",
+                             QMessageBox.Ok,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
+               self.urlErrMsgBox.show()
+            elif self.link == -1:
+               # keep working; map operations wait in the outbox until the map can be reached
+               self.urlErrMsgBox=QMessageBox(QMessageBox.Warning,"Error","Could not connect to the map at "+self.session.url+
+                             "\n\nMarker changes will be queued and sent when the map can be reached.",
+                             QMessageBox.Ok,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
+               self.urlErrMsgBox.show()
+            log.info("link status:"+str(self.link))
+            if self.session.client is None and self.outbox.count():
+                log.info(str(self.outbox.count())+" map operations left from the previous run")
+                self.scheduleFlush()
+
+    # queueMapOp - record a map operation in the outbox and get it sent;
+    #  a newer operation for the same key replaces one that is still pending
+    def queueMapOp(self,op,args,key=None):
+        self.session.queueMapOp(op,args,key)
+        if self.session.client is None and not self.flushQueued:
+            self.flushTimer.start(self.flushDelay)
+
+    def scheduleFlush(self):
+        if not self.flushQueued:
+            self.flushQueued=True
+            self.worker.submit(self.flushOutbox,callback=self.outboxFlushed)
+
+    # flushOutbox runs on the worker thread, after createSTS; as
+    #  TeamMarkers.flush, but None also if there is no map to flush to
+    def flushOutbox(self):
+        if self.teamMarkers is None:
+            return None     # no map in this session
+        return self.teamMarkers.flush()
+
+    def outboxFlushed(self,rval):
+        self.flushQueued=False
+        if self.sts:
+            self.link=self.sts.apiVersion
+        if rval is None:
+            # retrying can not help
+            if self.sts:
+                log.error("map session is not valid ("+str(self.sts.invalidReason)+"); "+
+                          str(self.outbox.count())+" map operations stay queued")
+            else:
+                log.info("no map in the session; "+str(self.outbox.count())+" map operations stay queued")
+            return
+        if self.outbox.count():
+            if rval is True:
+                self.scheduleFlush()        # more was queued meanwhile
+            else:
+                log.warning("map not reachable; "+str(self.outbox.count())+" map operations queued")
+                self.flushTimer.start(5000)
+
+    def refreshAssignments(self):
+        self.worker.submit(self.readAssignments)
+
+    # readAssignments runs on the worker thread, and updates the assignment
+    #  index there too; None if the map can't be read
+    def readAssignments(self):
+        if self.sts is None or self.sts.apiVersion < 0 or not self.sts.syncFeatures():
+            return None
+        features=self.sts.findFeatures("Assignment",sync=False)
+        self.assignmentIndex.update(features)
+        return features
 
     def updateFeatureList(self,featureClass,filterFolderId=None):
         # unfiltered feature list should be kept as an object;
         #  filtered feature list (i.e. combobox items) should be recalculated here on each call 
-        print("updateFeatureList called: "+featureClass+"  filterFolderId="+str(filterFolderId))
+        log.debug("updateFeatureList called: "+featureClass+"  filterFolderId="+str(filterFolderId))
         if self.sts and self.link>0:
-            rval=self.sts.getFeatures(featureClass,self.since[featureClass])
+            rval=self.sts.getFeatures(featureClass,self.since[featureClass],stream=True)
             self.since[featureClass]=int(time.time()*1000) # sartopo wants integer milliseconds
-            print("At sts check")
+            log.debug("At sts check")
             if rval:
-                print("rval:"+str(rval))
+                log.debug("rval:"+str(rval))
                 for feature in rval:
                     for oldFeature in self.featureListDict[featureClass]:
                         if feature["id"]==oldFeature["id"]:
@@ -314,76 +484,79 @@ class MainWindow(QDialog,Ui_MainWindow):
                     fid=prop.get("folderId",0)
                     if fid!=filterFolderId:
                         add=False
-                        print("      filtering out feature:"+str(id))
+                        log.debug("      filtering out feature:"+str(id))
                 if add:
-                    print("    adding feature:"+str(id))
+                    log.debug("    adding feature:"+str(id))
                     if featureClass=="Folder":
                         items.append([name,id])
                     else:
                         items.append([name,[id,prop]])
             else:
-                print("no return data, i.e. no new features of this class since the last check")
+                log.debug("no return data, i.e. no new features of this class since the last check")
         else:
-            print("No map link has been established yet.  Could not get Folder objects.")
+            log.info("No map link has been established yet.  Could not get Folder objects.")
             self.featureListDict[featureClass]=[]
             self.since[featureClass]=0
             items=[]
-        print("  unfiltered list:"+str(self.featureListDict[featureClass]))
-        print("  filtered list:"+str(items))
+        log.debug("  unfiltered list:"+str(self.featureListDict[featureClass]))
+        log.debug("  filtered list:"+str(items))
         
     def readConfigFile(self):
         # create the file (and its directory) if it doesn't already exist
         dir=os.path.dirname(self.configFileName)
         if not os.path.exists(self.configFileName):
-            print("Config file "+self.configFileName+" not found.")
+            log.info("Config file "+self.configFileName+" not found.")
             if not os.path.isdir(dir):
                 try:
-                    print("Creating config dir "+dir)
+                    log.info("Creating config dir "+dir)
                     os.makedirs(dir)
                 except:
-                    print("ERROR creating directory "+dir+" for config file.  Better luck next time.")
+                    log.error("ERROR creating directory "+dir+" for config file.  Better luck next time.")
             try:
                 defaultConfigFileName=os.path.join(os.path.dirname(os.path.realpath(__file__)),"default.cfg")
-                print("Copying default config file "+defaultConfigFileName+" to "+self.configFileName)
+                log.info("Copying default config file "+defaultConfigFileName+" to "+self.configFileName)
                 shutil.copyfile(defaultConfigFileName,self.configFileName)
             except:
-                print("ERROR copying the config file.  Better luck next time.")
+                log.error("ERROR copying the config file.  Better luck next time.")
                 
         # specify defaults here
         self.watchedDir="Z:\\"
+        self.watchMode="auto"      # auto: change notifications plus polling; poll: polling only
+        self.logLevel="INFO"       # DEBUG shows per-operation detail
+        self.statsPanel=False      # show the performance panel at startup (F2 toggles it)
+        self.staleMinutes=30       # teams silent for longer are shown in red in the team status panel (F3)
+        self.server=""             # host:port of a plans_console_headless --listen, to connect to instead
         
-        configFile=QFile(self.configFileName)
-        if not configFile.open(QFile.ReadOnly|QFile.Text):
-            warn=QMessageBox(QMessageBox.Warning,"Error","Cannot read configuration file " + self.configFileName + "; using default settings. "+configFile.errorString(),
-                            QMessageBox.Ok,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
-            warn.show()
-            warn.raise_()
-            warn.exec_()
-            return
-        inStr=QTextStream(configFile)
-        line=inStr.readLine()
-        if line!="[Plans_console]":
-            warn=QMessageBox(QMessageBox.Warning,"Error","Specified configuration file " + self.configFileName + " is not a valid configuration file; using default settings.",
+        # the same file, read the same way, as plans_console_headless
+        config,problem=readConfig(self.configFileName)
+        if problem:
+            warn=QMessageBox(QMessageBox.Warning,"Error",problem[0].upper()+problem[1:]+"; using default settings.",
                             QMessageBox.Ok,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
             warn.show()
             warn.raise_()
             warn.exec_()
-            configFile.close()
             return
-        
-        while not inStr.atEnd():
-            line=inStr.readLine()
-            tokens=line.split("=")
-            if tokens[0]=="watchedDir":
-                self.watchedDir=tokens[1]
-                print("watchedDir specification "+self.watchedDir+" parsed from config file.")
-        configFile.close()
+        if "watchedDir" in config:
+            self.watchedDir=config["watchedDir"]
+            log.info("watchedDir specification "+self.watchedDir+" parsed from config file.")
+        self.watchMode=config.get("watchMode",self.watchMode).lower()
+        self.logLevel=config.get("logLevel",self.logLevel).upper()
+        if "statsPanel" in config:
+            self.statsPanel=config["statsPanel"].lower() in ["1","yes","true","on"]
+        self.staleMinutes=config.get("staleMinutes",self.staleMinutes)
+        self.server=config.get("server",self.server)
         
         # validation and post-processing of each item
         configErr=""
 
         # process any ~ characters
         self.watchedDir=os.path.expanduser(self.watchedDir)             
+
+        try:
+            self.staleMinutes=float(self.staleMinutes)
+        except ValueError:
+            configErr+="staleMinutes must be a number of minutes; using 30\n"
+            self.staleMinutes=30
             
         if configErr:
             self.configErrMsgBox=QMessageBox(QMessageBox.Warning,"Non-fatal Configuration Error(s)","Error(s) encountered in config file "+self.configFileName+":\n\n"+configErr,
@@ -394,150 +567,231 @@ class MainWindow(QDialog,Ui_MainWindow):
         exit()
 
     def rescanButtonClicked(self):
-        self.forceRescan = 1
-        self.rescan()    #force a rescan/refresh
+        if self.session.client:
+            self.session.client.send({"t":"rescan"})   # the server reads the radiolog
+            return
+        self.rescan(force=True)    #force a rescan/refresh
             
-    def rescan(self):
-        print("scanning "+self.watchedDir+" for latest valid csv file...")
-        self.csvFiles=[]
-        self.readDir()
-        if self.csvFiles!=[]:
-            self.rescanTimer.stop()
-            self.ui.notYet.close()
-            self.watchedFile=self.csvFiles[0][0]
-            self.setWindowTitle("Plans_console B - "+os.path.basename(self.watchedFile))
-            # remove the pygtail offset file, if any, so pygtail will
-            #  read from the beginning even if this file has already
-            #  been read by pygtail
-            self.offsetFileName=self.watchedFile+".offset"+str(os.getpid())
-            if os.path.isfile(self.offsetFileName):
-                os.remove(self.offsetFileName)
-            print("  found "+self.watchedFile)
-            self.refresh()
+    # rescan - look for the newest csv file (see ConsoleSession.rescan), and
+    #  watch it
+    def rescan(self,force=False):
+        found=self.session.rescan(force)
+        if found is None:
+            return
+        self.dirNotifier.stop()
+        self.ui.notYet.close()
+        if found:
+            self.setWindowTitle("Plans_console B - "+os.path.basename(self.session.watchedFile))
+        self.fileNotifier.watch(self.session.watchedFile)
+        self.refresh()
 
     # refresh - this is the main radiolog viewing loop
     #  - read any new lines from the log file
-    #  - process each new line
-    #    - add a row to the appropriate panel's table    
+    #  - add them to the top of the radiolog table, in one model insert
     def refresh(self):
-        if self.csvFiles!=[]:
-            newEntries=self.readWatchedFile()
-            if newEntries:
-                ix = 0
-                for entry in newEntries:
-                    print("In loop: %s"% entry)                   
-                    if len(entry)==10:
-                        if self.forceRescan == 1:
-                            print("AT force rescan")
-                            if ix < self.totalRows:
-                                ix = ix + 1
-                                continue    # skip rows until get to new rows
-                        time,tf,callsign,msg,radioLoc,status,epoch,d1,d2,d3=entry
-                        self.ui.tableWidget.insertRow(0)
-                        self.ui.tableWidget.setItem(0, 0, QtWidgets.QTableWidgetItem(time))
-                        self.ui.tableWidget.setItem(0, 1, QtWidgets.QTableWidgetItem(callsign))    
-                        self.ui.tableWidget.setItem(0, 2, QtWidgets.QTableWidgetItem(msg))    
-                        self.ui.tableWidget.setItem(0, 3, QtWidgets.QTableWidgetItem(status))    
-                        prevColor=self.ui.tableWidget.item(0,1).background().color().name()
-                        newColor=stateColorDict.get(prevColor,self.color[0])
-                        self.setRowColor(self.ui.tableWidget,0,newColor)
-                        self.totalRows = self.ui.tableWidget.rowCount()
-                        print("status:"+status+"  color:"+statusColorDict.get(status,["eeeeee",""])[0])
+        if self.restoring:       # wait until the saved session is fully restored
+            return
+        if self.session.csvFiles!=[]:
+            rows,fingerprints,epochs = self.session.readRows()
+            if rows:
 ## save data
-                self.save_data()                
-
-    def save_data(self):
-        print("In savedata")
-        data1 = {}
-        rowx = {}
-        rowy = {}
-        for itm in range(self.ui.tableWidget.rowCount()):
-            data1['time'] = self.ui.tableWidget.item(itm, 0).text()
-            data1['callsign'] = self.ui.tableWidget.item(itm, 1).text()
-            data1['msg'] = self.ui.tableWidget.item(itm, 2).text()
-            data1['status'] = self.ui.tableWidget.item(itm, 3).text()
-            data1['color'] = self.ui.tableWidget.item(itm,1).background().color().name()
-            rowx['rowA'+str(itm)] = data1.copy()
-        for itm2 in range(self.ui.tableWidget_TmAs.rowCount()):
-            data1.update({'team': self.ui.tableWidget_TmAs.item(itm2, 0).text()})
-            data1.update({'assign': self.ui.tableWidget_TmAs.item(itm2, 1).text()})
-            data1.update({'type': self.ui.tableWidget_TmAs.item(itm2, 2).text()})
-            data1.update({'med': self.ui.tableWidget_TmAs.item(itm2, 3).text()})
-            rowy['rowB'+str(itm2)] = data1.copy()
-        alld = json.dumps([{'url':self.url},{'csv':self.watchedFile+'%'+self.offsetFileName+ \
-                                             '%'+str(self.csvFiles)}, rowx, rowy])
-        fid = open("save_plans_console.txt",'w')
-        fid.write(alld)
-        fid.close()
+                self.session.addRows(rows,fingerprints,epochs,append=self.radioLogModel.appendRows)
+                self.scheduleIndex()
+                self.updateSearchCount()
+            # a file that shrank is read from the beginning if it is still
+            #  short after the tailer's grace period, which may bring no
+            #  change notification: look again then
+            wait = self.session.rereadIn()
+            if wait is not None and not self.rereadQueued:
+                self.rereadQueued = True
+                QTimer.singleShot(int(wait*1000)+50,self.rereadShrunk)
+
+    def rereadShrunk(self):
+        self.rereadQueued = False
+        self.rescan()
+
+    # save_data - a change made here (a team, or a row's highlight): it is
+    #  applied to the session and journaled, or sent to the server
+    def save_data(self,record):
+        self.session.commit(record)
 
+    # load_data - restore the saved session.  Only the leading session
+    #  record(s) are read here, so the window can be built and shown right
+    #  away; the rest of the snapshot and journal is streamed into the
+    #  radiolog store by restoreChunk from the event loop
     def load_data(self):
-        print("In load data")
-        fid = open("save_plans_console.txt",'r')
-        alld = fid.read()
-        l = json.loads(alld)
-        print("Get:"+str(l))
-        self.url = l[0]['url']
-        self.watchedFile,self.offsetFileName, self.csvFiles = l[1]['csv'].split('%')
-        irow = 0
-        for key in l[2]:
-            self.ui.tableWidget.insertRow(irow)            
-            self.ui.tableWidget.setItem(irow, 0, QtWidgets.QTableWidgetItem(l[2][key]['time']))
-            self.ui.tableWidget.setItem(irow, 1, QtWidgets.QTableWidgetItem(l[2][key]['callsign']))
-            self.ui.tableWidget.setItem(irow, 2, QtWidgets.QTableWidgetItem(l[2][key]['msg']))
-            self.ui.tableWidget.setItem(irow, 3, QtWidgets.QTableWidgetItem(l[2][key]['status']))
-            self.setRowColor(self.ui.tableWidget,irow,l[2][key]['color'])
-            irow = irow + 1
-        irow = 0    
-        for key in l[3]:
-            self.ui.tableWidget_TmAs.insertRow(irow)            
-            self.ui.tableWidget_TmAs.setItem(irow, 0, QtWidgets.QTableWidgetItem(l[3][key]['team']))
-            self.ui.tableWidget_TmAs.setItem(irow, 1, QtWidgets.QTableWidgetItem(l[3][key]['assign']))    
-            self.ui.tableWidget_TmAs.setItem(irow, 2, QtWidgets.QTableWidgetItem(l[3][key]['type']))
-            self.ui.tableWidget_TmAs.setItem(irow, 3, QtWidgets.QTableWidgetItem(l[3][key]['med']))
-            irow = irow + 1
-        fid.close()
-        
-    def setRowColor(self,table,row,color):
-        for col in range(table.columnCount()):
-            table.item(row,col).setBackground(QColor(color))
-
-    def tableCellClicked(self,row,col):
-        table=self.sender()
-        i=table.item(row,col)
-        if i:
-            prevColor=i.background().color().name()
-            if prevColor == self.color[1]:
-                newColor=stateColorDict.get(prevColor,self.color[0])
+        log.info("In load data")
+        self.restoreStart = time.time()
+        self.restoreRecords = self.journal.records()
+        for record in self.restoreRecords:
+            self.applyRecord(record)
+            if record.get("t") != "session":
+                break
+        self.restoring = True
+        QTimer.singleShot(0,self.restoreChunk)
+
+    def restoreChunk(self):
+        deadline = time.time()+0.05    # keep the UI responsive during long restores
+        for record in self.restoreRecords:
+            self.applyRecord(record)
+            if time.time() > deadline:
+                self.radioLogModel.resetFromStore()
+                QTimer.singleShot(0,self.restoreChunk)
+                return
+        self.radioLogModel.resetFromStore()
+        self.restoring = False
+        self.scheduleIndex()
+        self.updateSearchCount()
+        log.info("session restored: "+str(len(self.radioLogStore))+" rows in %.3f seconds"%(time.time()-self.restoreStart))
+        # start the new journal from a fresh snapshot of the restored session
+        self.session.restored()
+        if self.session.watchedFile:
+            self.fileNotifier.watch(self.session.watchedFile)
+            self.refresh()
+        else:
+            # saved before radiolog wrote a csv file: wait for one, as in a
+            #  new session
+            self.ui.notYet.show()
+            self.dirNotifier.watch(self.watchedDir)
+            QTimer.singleShot(0,self.rescan)
+        self.enableSessionControls(True)
+
+    # applyRecord - replay one session record; radiolog rows go straight to
+    #  the store, and the caller tells the model about them in bulk
+    def applyRecord(self,record):
+        self.session.applyRecord(record)
+        t = record.get("t")
+        if t == "team":
+            self.setTeamRow(record["team"],record["assign"],record["type"],record["med"])
+        elif t == "rmteam":
+            irow = self.findTeamRow(record["team"])
+            if irow >= 0:
+                self.ui.tableWidget_TmAs.removeRow(irow)
+
+    # connectServer - show the session kept by plans_console_headless (see
+    #  session_link.py) instead of one of our own; it is received like a
+    #  restore, and then kept up to date by readServer
+    def connectServer(self):
+        from session_link import SessionClient
+        try:
+            self.session.client=SessionClient(self.server)
+        except (OSError,ValueError) as e:
+            warn=QMessageBox(QMessageBox.Warning,"Error","Could not connect to plans_console_headless at "+self.server+":\n\n"+str(e),
+                            QMessageBox.Ok,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
+            warn.show()
+            return
+        log.info("connected to plans_console_headless at "+self.server)
+        self.sessionBar.hide()
+        self.searchBar.show()
+        self.setWindowTitle("Plans_console B - "+self.server)
+        self.restoring = True
+        self.restoreStart = time.time()
+        self.serverTimer=QTimer(self)
+        self.serverTimer.timeout.connect(self.readServer)
+        self.serverTimer.start(50)
+
+    def readServer(self):
+        client = self.session.client
+        deadline = time.time()+0.05    # keep the UI responsive while the session comes in
+        while time.time() < deadline:
+            try:
+                record = client.records.get_nowait()
+            except queue.Empty:
+                return
+            t = record and record.get("t")
+            if record is None:
+                self.serverTimer.stop()
+                self.enableSessionControls(False)
+                log.error("lost the connection to plans_console_headless")
+                self.serverErrMsgBox=QMessageBox(QMessageBox.Warning,"Error","Lost the connection to plans_console_headless at "+self.server+
+                             ".\n\nRestart plans_console to connect again.",
+                             QMessageBox.Ok,self,Qt.WindowTitleHint|Qt.WindowCloseButtonHint|Qt.Dialog|Qt.MSWindowsFixedSizeDialogHint|Qt.WindowStaysOnTopHint)
+                self.serverErrMsgBox.show()
+                return
+            if self.restoring:
+                if t == "live":     # the whole session is here
+                    self.radioLogModel.resetFromStore()
+                    self.restoring = False
+                    self.scheduleIndex()
+                    self.updateSearchCount()
+                    log.info("session received: "+str(len(self.radioLogStore))+" rows in %.3f seconds"%(time.time()-self.restoreStart))
+                    self.enableSessionControls(True)
+                    self.startSartopo()     # to read the assignments
+                else:
+                    self.applyRecord(record)
+            elif t == "rows":
+                self.session.addRows(record["rows"],record.get("fp"),record.get("ep"),
+                                     append=self.radioLogModel.appendRows,save=False)
+                self.scheduleIndex()
+                self.updateSearchCount()
+            elif t == "hl":
+                self.session.applyRecord(record)
+                self.ui.tableView.viewport().update()
             else:
-                newColor=stateColorDict.get(prevColor,self.color[1])
-            self.setRowColor(self.ui.tableWidget,row,newColor)
+                self.applyRecord(record)
+
+    def findTeamRow(self,team):
+        for irow in range(self.ui.tableWidget_TmAs.rowCount()):
+            if self.ui.tableWidget_TmAs.item(irow,0).text() == team:
+                return irow
+        return -1
+
+    # setTeamRow - update the team's row in the team/assignment table, or add
+    #  it at the top if the team is not in the table yet
+    def setTeamRow(self,team,assign,type,med):
+        irow = self.findTeamRow(team)
+        if irow < 0:
+            self.ui.tableWidget_TmAs.insertRow(0)
+            irow = 0
+        for col,val in enumerate([team,assign,type,med]):
+            self.ui.tableWidget_TmAs.setItem(irow, col, QTableWidgetItem(val))
+        
+    def tableCellClicked(self,index):
+        if index.isValid():
+            self.radioLogModel.toggleHighlight(index.row())   # yellow <-> gray
+            i = self.radioLogModel.storeIndex(index.row())
 ## save data
-        self.save_data()
+            self.save_data({"t":"hl","i":i,"v":int(self.radioLogStore.isHighlighted(i))})
 
     def assignTab_OK_clicked(self):
-        print("Ok button clicked, team is:"+self.ui.Team.text())
-        rval = self.sts.getFeatures("Assignment",0)     # get assignments
-        ifnd = 1                                        # flag for found valid Assignment
+        log.info("Ok button clicked, team is:"+self.ui.Team.text())
         ## location code are IC for command post (for type LE, leave marker on map, but at (lon-0.5deg) )
         ##                   TR for in transit
         ##                   RM to remove a team from the table
         ##                   Assignment name 
         if self.ui.Assign.text() != "IC" and self.ui.Assign.text() != "TR" \
            and self.ui.Assign.text() != "RM" : ## chk to see if assignment exists (ignore IC, TR, RM)
-          ifnd = 0  
-          for self.feature in rval:
-            ##print("ZZZZ:"+str(self.feature["properties"].get("letter")))  # search for new assignment
-            if str(self.feature["properties"].get("letter")) == self.ui.Assign.text():   # find assignment on map
-                ##print("Geo:"+str(self.feature.get("geometry")))
-                ifnd = 1     # found the desired assignment on the map, so continue
-                break
-        if self.ui.Team.text() == "" or ifnd == 0:  # error - checking select below when entry does not exist
+            assign = self.ui.Assign.text()
+            self.assignment = self.assignmentIndex.lookup(assign)
+            if self.assignment is None:
+                # not known yet (maybe new on the map): read the assignments
+                #  on the worker thread; processing continues in assignTab_OK_found
+                self.ui.OKbut.setEnabled(False)
+                self.worker.submit(self.readAssignments,
+                                   callback=lambda rval: self.assignTab_OK_found(assign,rval))
+                return
+        self.assignTab_OK_continue()
+
+    def assignTab_OK_found(self,assign,rval):
+        self.ui.OKbut.setEnabled(True)
+        if not isinstance(rval,list) or self.ui.Assign.text() != assign:  # lookup failed or entry was edited meanwhile
+            log.warning("Issue with Assign inputs")
+            return
+        self.assignment = self.assignmentIndex.lookup(assign)
+        if self.assignment is None:  # error - checking select below when entry does not exist
+            pass  # beepX1
+            log.warning("Issue with Assign inputs")
+            return
+        self.assignTab_OK_continue()
+
+    def assignTab_OK_continue(self):
+        if self.ui.Team.text() == "":  # error - checking select below when entry does not exist
             pass  # beepX1
-            print("Issue with Assign inputs")
+            log.warning("Issue with Assign inputs")
             return
         ifnd = 0                      # flag for found existing Team assignment
         irow = 0
-        print("count:"+str(self.ui.tableWidget_TmAs.rowCount()))
+        log.debug("count:"+str(self.ui.tableWidget_TmAs.rowCount()))
         for ix in range(self.ui.tableWidget_TmAs.rowCount()):      # Look for existing Team entry in table
             if self.ui.Team.text() == self.ui.tableWidget_TmAs.item(ix,0).text():  # update
                 ifnd = 1   # set found in table, may be on the map, too
@@ -554,20 +808,22 @@ class MainWindow(QDialog,Ui_MainWindow):
         if self.ui.comboBox.currentText() == "Select": 
             if ifnd == 0:                 # does not exist in table
                 pass  # beepX1
-                print("Issue with Assign inputs2")
+                log.warning("Issue with Assign inputs2")
                 return
             else:
                 indx = self.ui.comboBox.findText(self.ui.tableWidget_TmAs.item(ix,2).text())
-                print("INDEX is:"+str(indx))
+                log.debug("INDEX is:"+str(indx))
                 self.ui.comboBox.setCurrentIndex(indx)
                 if self.ui.tableWidget_TmAs.item(ix,3).text() == ' X':  # also check Med setting
                     self.ui.Med.setChecked(True)
         if self.ui.Assign.text() == "RM":     # want to completely remove team
             if ifnd == 1:               # want to remove and presently in table AND on map
                 self.curTeam = self.ui.Team.text()
-                self.delMarker()        # uses curTeam to find
+                self.queueMapOp("delMarker",[self.curTeam],key=self.curTeam)
             if ifnd == 1 or ifnd == 2:  # want to remove and presently only in table
                 self.ui.tableWidget_TmAs.removeRow(irow)
+## save data
+                self.save_data({"t":"rmteam","team":self.ui.Team.text()})
             # clear fields
             if ifnd == 0:    # entry not found in table
                 pass  #  beep
@@ -576,8 +832,6 @@ class MainWindow(QDialog,Ui_MainWindow):
                 self.ui.Assign.setText("")
                 self.ui.comboBox.setCurrentIndex(0)
                 self.ui.Med.setChecked(False)
-## save data
-            self.save_data()    
             return
         ##  ifnd=0  not in table and not on map  - add team and marker
         ##  ifnd=1  in table and on map          - update/moving
@@ -588,93 +842,70 @@ class MainWindow(QDialog,Ui_MainWindow):
             pass # beep
             return
         ###if ifnd == 0: self.ui.tableWidget_TmAs.insertRow(0)
-        if ifnd == 1:                             # moving so remove present loc on map
-            self.curTeam = self.ui.tableWidget_TmAs.item(irow,0).text()
-            self.delMarker()        # uses curTeam to find
+        if ifnd == 1:                             # moving; setMarker moves it in place
+            movedTeam = self.ui.tableWidget_TmAs.item(irow,0).text()
         cntComma = self.ui.Team.text().count(',')+1   # add 1 for first element
         tok = self.ui.Team.text().split(',')
+        newMarkers = []
+        # several teams in one place are spread out so that their markers do
+        #  not cover each other; teams that are already there keep the first slots
+        assign = self.ui.Assign.text()
+        if assign == "IC" or assign == "TR":        # only LE get a marker, around NCSO
+            center,ring = self.NCSO,None
+        else:
+            center,ring = self.assignment["location"],self.assignment["ring"]
+        there = 0
+        for ix in range(self.ui.tableWidget_TmAs.rowCount()):
+            if self.ui.tableWidget_TmAs.item(ix,1).text() == assign and \
+               self.ui.tableWidget_TmAs.item(ix,0).text() not in tok and \
+               (center is not self.NCSO or self.ui.tableWidget_TmAs.item(ix,2).text() == "LE"):
+                there = there+1
+        from geometry import spreadLocations
+        locs = spreadLocations(center,cntComma,ring=ring,first=there)
         for ix in range(cntComma):
-            if ifnd == 0: self.ui.tableWidget_TmAs.insertRow(0)
-            self.ui.tableWidget_TmAs.setItem(irow, 0, QtWidgets.QTableWidgetItem(tok[ix]))
-            self.ui.tableWidget_TmAs.setItem(irow, 1, QtWidgets.QTableWidgetItem(self.ui.Assign.text()))    
-            self.ui.tableWidget_TmAs.setItem(irow, 2, QtWidgets.QTableWidgetItem(self.ui.comboBox.currentText()))
             self.curTeam = tok[ix]
             self.curAssign = self.ui.Assign.text()
             self.curType = self.ui.comboBox.currentText()
             if self.ui.Med.isChecked(): self.medval = " X"
             else: self.medval = " "    #  need at least a space so that it is not empty
-            self.ui.tableWidget_TmAs.setItem(0, 3, QtWidgets.QTableWidgetItem(self.medval))
-        # find center of shape in latField and lonField float
-            if self.curType == "LE" and self.curAssign == "IC":    # moving LE to 'IC' (away)
-                self.lonField = self.NCSO[1]+random.uniform(-1.0, 1.0)*0.001  # temp location; randomly adjust
-                self.latField = self.NCSO[0]+random.uniform(-1.0, 1.0)*0.001    # +/-0.001 deg lat and long
-            else:   
-                self.calcLatLon_center()              # use self.ui.Assign.text() to find shape
+            self.setTeamRow(self.curTeam,self.curAssign,self.curType,self.medval)
+## save data
+            self.save_data({"t":"team","team":self.curTeam,"assign":self.curAssign,
+                            "type":self.curType,"med":self.medval})
+            self.latField,self.lonField = locs[ix]
         # set marker type (in addMarker) based on Med or if type=LE
             if (self.curAssign != "IC" and self.curAssign != "TR") or self.curType == "LE":
-                self.addMarker()          # uses self.ui.Team, medval
+                newMarkers.append([self.curTeam,self.curAssign,self.curType,
+                                   self.medval,self.latField,self.lonField])
+        if ifnd == 1 and not newMarkers:          # moved off the map (to IC or TR)
+            self.queueMapOp("delMarker",[movedTeam],key=movedTeam)
+        for marker in newMarkers:
+            # moves an existing marker in place; flushed as one batch for all teams
+            self.queueMapOp("setMarker",marker,key=marker[0])
 
         # clear fields
         self.ui.Team.setText("")
         self.ui.Assign.setText("")
         self.ui.comboBox.setCurrentIndex(0)
         self.ui.Med.setChecked(False)
-## save data            
-        self.save_data()
-        
-    def calcLatLon_center(self):
-        print("iN LATLOG")
-        loc = self.feature['geometry'].get("coordinates")   # of an assignment
-        loc_lat = 0
-        loc_long = 0
-        ipt = 0
-        lenloc = len(loc)
-        if type(loc[0][0]) is list:    # polygon is list of list
-            loc = loc[0]  
-            ipt = 1                 # skip 1st pt of polygon since it is repeated
-            lenloc = len(loc) - 1
-            for loca in loc:
-              if ipt == 1:
-                  ipt = 0
-                  continue            # skip 1st pt
-              loc_lat = loc_lat + loca[1]
-              loc_long = loc_long + loca[0]
-            avg_lat = loc_lat/lenloc
-            avg_lon = loc_long/lenloc
-        else:    # line
-            loca = loc[int(lenloc/2)]   # use its mid point
-            avg_lat = loca[1]
-            avg_lon = loca[0]
-        print("Loc-lat:"+str(avg_lat)+" loc-long:"+str(avg_lon))
-        self.latField = avg_lat
-        self.lonField = avg_lon
         
-    # get a list of non-clueLog filenames, modification times, and sizes
-    #  in the watchedDir, sorted by modification time (so that the most recent
-    #  file is the first item in the list)
-    def readDir(self):
-        print("in readDir")
-        f=glob.glob(self.watchedDir+"\\*.csv")
-        print("Files: %s"%f)
-        f=[x for x in f if not regex.match('.*_clueLog.csv$',x)]
-        f=[x for x in f if not regex.match('.*_fleetsync.csv$',x)]
-        f=[x for x in f if not regex.match('.*_bak[123456789].csv$',x)]
-        f=sorted(f,key=os.path.getmtime,reverse=True)
-        for file in f:
-            l=[file,os.path.getsize(file),os.path.getmtime(file)]
-            self.csvFiles.append(l)
-
-    def readWatchedFile(self):
-        newEntries=[]
-        for line in Pygtail(self.watchedFile,offset_file=self.offsetFileName):
-            newEntries.append(line.split(','))
-        return newEntries
-                
+    def toggleStatsPanel(self):
+        if self.statsPanelWindow is None:
+            from stats_panel import StatsPanel
+            self.statsPanelWindow=StatsPanel(stats,self)
+        self.statsPanelWindow.setVisible(not self.statsPanelWindow.isVisible())
+
+    def toggleTeamStatusPanel(self):
+        if self.teamStatusPanelWindow is None:
+            from team_status_panel import TeamStatusPanel
+            self.teamStatusPanelWindow=TeamStatusPanel(self.teamStatus,statusColorDict,self.staleMinutes,self)
+        self.teamStatusPanelWindow.setVisible(not self.teamStatusPanelWindow.isVisible())
+
     def updateClock(self):
         self.ui.clock.display(time.strftime("%H:%M"))
         
     def saveRcFile(self):
-        print("saving...")
+        log.debug("saving...")
         (self.x,self.y,self.w,self.h)=self.geometry().getRect()
         rcFile=QFile(self.rcFileName)
         if not rcFile.open(QFile.WriteOnly|QFile.Text):
@@ -694,7 +925,7 @@ class MainWindow(QDialog,Ui_MainWindow):
         rcFile.close()
         
     def loadRcFile(self):
-        print("loading...")
+        log.debug("loading...")
         rcFile=QFile(self.rcFileName)
         if not rcFile.open(QFile.ReadOnly|QFile.Text):
             warn=QMessageBox(QMessageBox.Warning,"Error","Cannot read resource file " + self.rcFileName + "; using default settings. "+rcFile.errorString(),
@@ -730,10 +961,17 @@ class MainWindow(QDialog,Ui_MainWindow):
                 
     def closeEvent(self,event):  # to save RC file
         self.saveRcFile()
+        if self.serverTimer:
+            self.serverTimer.stop()
+        self.worker.stop()
+        self.session.close()
+        for line in stats.summary():
+            log.info(line)
         event.accept()
         self.parent.quit()
         
 def main():
+    logging.basicConfig(level=logging.INFO,format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
     w = MainWindow(app)
     w.show()
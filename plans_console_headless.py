@@ -0,0 +1,217 @@
+# #############################################################################
+#
+#  plans_console_headless.py - run plans_console's radiolog ingest and map
+#    sync without the GUI, e.g. as a service on a small server
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Usage:
+#    python plans_console_headless.py [--config ./local/plans_console.cfg]
+#        [--dir WATCHEDDIR] [--map URL|MAPID|#MAPID] [--restore]
+#        [--poll SECONDS] [--listen [HOST]:PORT|off] [--log-level DEBUG]
+#
+#  Settings come from the same config file as plans_console (watchedDir,
+#   logLevel, plus url, accountName, pollInterval and listen, which only this
+#   program reads); command line options override the file.  A bare map id
+#   means a map on localhost:8080, and #id a map on sartopo.com, as in the
+#   plans_console session bar.
+#
+#  The session itself is a ConsoleSession (console_session.py), the same
+#   code the GUI runs on: the newest csv file in watchedDir is tailed, rows
+#   are kept in a RadioLogStore and journaled, and map operations in the
+#   outbox are sent by TeamMarkers.  With --listen (off unless given, here
+#   or as listen= in the config file) plans_console can run as a client
+#   (its 'Connect to server' button, with server= in its config file): it
+#   shows this program's session, and its team assignments, highlights and
+#   marker changes are sent here to be journaled and sent to the map - see
+#   session_link.py.  Clients are not authenticated, so listen on localhost
+#   or on a trusted network only.  The session files are the ones plans_console writes,
+#   so the GUI can also restore a session that was kept here on its own -
+#   but stop this program first, the two must not write the same session at
+#   the same time.
+#
+#  The main thread polls the csv file (one stat when nothing changed;
+#   quickly right after a change, backing off to pollInterval while idle)
+#   and handles what clients sent; a map thread flushes the outbox.  SIGHUP
+#   rescans watchedDir for a newer csv file; SIGINT or SIGTERM checkpoint
+#   and exit.
+#
+# #############################################################################
+
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+
+from console_session import ConsoleSession, mapUrl, readConfig
+from team_markers import TeamMarkers
+from perf_stats import stats
+from session_link import SessionServer, defaultPort
+
+log=logging.getLogger("plans_console_headless")
+
+class HeadlessConsole():
+    def __init__(self,watchedDir,url=None,accountName="",sessionFileName="save_plans_console.txt",
+                 outboxFileName="./local/plans_console_outbox.db",minInterval=0.25,pollInterval=3.0,
+                 listen=None):
+        self.session=ConsoleSession(watchedDir,sessionFileName,outboxFileName)
+        self.url=url
+        self.accountName=accountName
+        self.minInterval=minInterval
+        self.pollInterval=pollInterval
+        self.interval=minInterval
+        self.sts=None
+        self.teamMarkers=None
+        self.stopping=threading.Event()
+        self.wakeup=threading.Event()     # ends the main loop's sleep early
+        self.rescanRequested=False
+        self.mapThread=None
+        self.server=None
+        if listen:
+            self.server=SessionServer(self.session,listen,self.wakeup)
+
+    def start(self,restore=False):
+        session=self.session
+        if restore:
+            t0=time.time()
+            for record in session.journal.records():
+                session.applyRecord(record)
+            log.info("session restored: "+str(len(session.store))+" rows in %.3f seconds"%(time.time()-t0))
+            session.restored()
+            if self.url and self.url!=session.url:
+                session.commit({"t":"session","url":self.url})  # a map given on the command line wins
+        else:
+            session.start(self.url)
+        session.outbox.setMap(session.url)
+        if session.url:
+            self.mapThread=threading.Thread(target=self.mapLoop,name="map",daemon=True)
+            self.mapThread.start()
+        elif session.outbox.count():
+            log.warning("no map given; "+str(session.outbox.count())+" map operations stay queued")
+
+    # poll - read and journal whatever was added to the csv file; returns the
+    #  number of new rows
+    def poll(self):
+        session=self.session
+        if self.rescanRequested or not session.watchedFile:
+            force=self.rescanRequested
+            self.rescanRequested=False
+            if session.rescan(force) is None:
+                return 0
+        rows,fingerprints,epochs=session.readRows()
+        session.addRows(rows,fingerprints,epochs)
+        return len(rows)
+
+    def run(self):
+        while not self.stopping.is_set():
+            if self.server:
+                self.server.process()
+                if self.server.rescanRequested:
+                    self.server.rescanRequested=False
+                    self.rescanRequested=True
+            if self.poll():
+                self.interval=self.minInterval
+            else:
+                self.interval=min(self.interval*2,self.pollInterval)
+            wait=self.interval
+            reread=self.session.rereadIn()     # a file that shrank; see CsvTailer.graceLeft
+            if reread is not None:
+                wait=min(wait,reread+0.05)
+            self.wakeup.wait(wait)
+            self.wakeup.clear()
+
+    # mapLoop - runs on the map thread: connect, then send queued map
+    #  operations as they appear, retrying every retryInterval while the map
+    #  cannot be reached
+    def mapLoop(self,checkInterval=1.0,retryInterval=5.0):
+        self.sts=self.session.openMap(self.accountName)
+        if not self.sts.isValid():
+            log.error("map session is not valid ("+self.sts.invalidReason+"); map operations stay queued")
+            return
+        if self.sts.apiVersion<0:
+            log.warning("could not connect to the map at "+self.session.url+"; map operations will be queued")
+        outbox=self.session.outbox
+        self.teamMarkers=TeamMarkers(self.sts,outbox)
+        while not self.stopping.is_set():
+            wait=checkInterval
+            if outbox.count():
+                if self.teamMarkers.flush() is False:
+                    log.warning("map not reachable; "+str(outbox.count())+" map operations queued")
+                    wait=retryInterval
+            self.stopping.wait(wait)
+
+    def requestRescan(self):
+        self.rescanRequested=True
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def close(self):
+        self.stop()
+        if self.mapThread:
+            self.mapThread.join(30)
+        if self.server:
+            self.server.close()
+        self.session.close()
+        for line in stats.summary():
+            log.info(line)
+
+def main():
+    logging.basicConfig(level=logging.INFO,format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser=argparse.ArgumentParser(description="plans_console radiolog ingest and map sync, without the GUI")
+    parser.add_argument("--config",default="./local/plans_console.cfg",help="plans_console config file")
+    parser.add_argument("--dir",help="directory radiolog writes its csv files to (watchedDir)")
+    parser.add_argument("--map",help="map URL, or map id as in the plans_console session bar (#id for sartopo.com)")
+    parser.add_argument("--restore",action="store_true",help="continue the saved session")
+    parser.add_argument("--poll",type=float,help="longest time between checks of an idle csv file, in seconds")
+    parser.add_argument("--log-level",help="DEBUG shows per-operation detail")
+    parser.add_argument("--listen",help="[HOST]:PORT to accept plans_console GUI clients on (port %d if"
+                        " not given), or 'off' (the default); clients are not authenticated"%defaultPort)
+    args=parser.parse_args()
+
+    config,problem=readConfig(args.config)
+    if problem:
+        log.warning(problem+"; using default settings")
+    logLevel=(args.log_level or config.get("logLevel","INFO")).upper()
+    if isinstance(logging.getLevelName(logLevel),int):
+        logging.getLogger().setLevel(logLevel)
+    watchedDir=os.path.expanduser(args.dir or config.get("watchedDir","Z:\\"))
+    if not os.path.isdir(watchedDir):
+        log.error("specified directory to be watched does not exist: "+watchedDir)
+        return 1
+    try:
+        pollInterval=args.poll or float(config.get("pollInterval",3.0))
+    except ValueError:
+        log.error("invalid pollInterval in "+args.config)
+        return 1
+
+    listen=args.listen or config.get("listen","off")
+    if listen.lower() in ["","off","no","0"]:
+        listen=None
+
+    console=HeadlessConsole(watchedDir,mapUrl(args.map or config.get("url")),
+                            accountName=config.get("accountName",""),pollInterval=pollInterval,
+                            listen=listen)
+    signal.signal(signal.SIGINT,lambda *a:console.stop())
+    signal.signal(signal.SIGTERM,lambda *a:console.stop())
+    if hasattr(signal,"SIGHUP"):
+        signal.signal(signal.SIGHUP,lambda *a:console.requestRescan())
+    console.start(restore=args.restore)
+    try:
+        console.run()
+    finally:
+        console.close()
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
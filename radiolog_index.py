@@ -0,0 +1,117 @@
+# #############################################################################
+#
+#  radiolog_index.py - inverted index over the radiolog rows, for the
+#    search box above plans_console's radiolog table
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Every word of a row's callsign, message and status (lowercased runs of
+#   letters and digits) maps to the ascending list of store indices of the
+#   rows containing it.  The store is append-only, so update() only has to
+#   index the rows added since the last call, and each list only ever grows
+#   at the end.  A sorted vocabulary gives the words starting with a prefix
+#   with two bisects; new words are appended to it and it is re-sorted when
+#   next searched, which is cheap for a sorted list with a short tail.
+#
+#  search("team 3") finds the rows that contain every word of the query,
+#   the last word being taken as a prefix while it is still being typed
+#   (i.e. unless the query ends with a space): 'team' and any word starting
+#   with '3'.  Words are combined in a numpy boolean mask over the rows, so
+#   a short prefix matching thousands of words is still cheap, and the
+#   result comes out sorted.
+#
+#  Kept free of any Qt dependency, like the store.
+#
+# #############################################################################
+
+import re
+import bisect
+from array import array
+
+tokenPattern=re.compile(r"[^\W_]+")
+
+def tokens(text):
+    return tokenPattern.findall(text.lower())
+
+class RadioLogIndex():
+    def __init__(self,store):
+        self.store=store
+        self.clear()
+
+    def clear(self):
+        self.postings={}     # word: array of store indices, ascending
+        self.vocabulary=[]   # all words, sorted unless vocabularySorted is False
+        self.vocabularySorted=True
+        self.indexed=0       # store rows [0,indexed) are in the index
+
+    # update - index the rows added to the store since the last call, or at
+    #  most limit of them; returns the number of rows still to be indexed
+    def update(self,limit=None):
+        store=self.store
+        if len(store)<self.indexed:   # the store was cleared
+            self.clear()
+        n=len(store) if limit is None else min(len(store),self.indexed+limit)
+        if n==self.indexed:
+            return len(store)-n
+        postings=self.postings
+        vocabulary=self.vocabulary
+        findall=tokenPattern.findall
+        callsigns,msgs,statuses=store.callsigns,store.msgs,store.statuses
+        for i in range(self.indexed,n):
+            for word in set(findall((callsigns[i]+" "+msgs[i]+" "+statuses[i]).lower())):
+                p=postings.get(word)
+                if p is None:
+                    p=postings[word]=array('i')
+                    vocabulary.append(word)
+                p.append(i)
+        self.indexed=n
+        self.vocabularySorted=False
+        if n==len(store):
+            self.sortVocabulary()   # ahead of the next search
+        return len(store)-n
+
+    def sortVocabulary(self):
+        if not self.vocabularySorted:
+            self.vocabulary.sort()
+            self.vocabularySorted=True
+
+    # words - the indexed words that start with prefix
+    def words(self,prefix):
+        self.sortVocabulary()
+        lo=bisect.bisect_left(self.vocabulary,prefix)
+        hi=bisect.bisect_left(self.vocabulary,prefix+"\U0010ffff")
+        return self.vocabulary[lo:hi]
+
+    # search - ascending numpy array of the store indices, from start on, of
+    #  the rows matching query; None if the query has no words (no filter)
+    def search(self,query,start=0):
+        import numpy as np
+        self.update()
+        queryWords=tokens(query)
+        if not queryWords:
+            return None
+        n=self.indexed
+        if start>=n:
+            return np.zeros(0,dtype=np.intp)
+        lastIsPrefix=not query[-1:].isspace()
+        mask=None
+        for k,word in enumerate(queryWords):
+            if lastIsPrefix and k==len(queryWords)-1:
+                words=self.words(word)
+            else:
+                words=[word] if word in self.postings else []
+            # all the words' lists in one array; one pass sets the mask
+            rows=np.frombuffer(b"".join([self.postings[w] for w in words]),dtype=np.int32)
+            if start:
+                rows=rows[rows>=start]
+            wordMask=np.zeros(n-start,dtype=bool)
+            wordMask[rows-start]=True
+            mask=wordMask if mask is None else (mask&wordMask)
+            if not mask.any():
+                break
+        return np.flatnonzero(mask)+start
@@ -0,0 +1,148 @@
+# #############################################################################
+#
+#  radiolog_model.py - Qt table model presenting a RadioLogStore to the
+#    radiolog view of plans_console.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from PyQt5.QtGui import QBrush, QColor
+
+from radiolog_store import RadioLogStore, HIGHLIGHT_COLOR, PROCESSED_COLOR
+
+class RadioLogModel(QAbstractTableModel):
+    """
+    Read-only table model over a RadioLogStore.
+
+    The store is append-only in arrival order; the model shows it newest
+    first by mapping view row r to store index len-1-r, so appending rows
+    never moves any data - the view is only told that rows were inserted
+    at the top, and only paints what is visible.
+
+    Rows are also exposed lazily through canFetchMore/fetchMore: only the
+    newest 'fetched' rows are reported to the view, and older ones are
+    handed over a batch at a time as the view is scrolled down to them.
+
+    setFilter narrows the view to the rows a matcher picks (the search box;
+    see radiolog_index.py).  The matcher returns the ascending store indices
+    of the matching rows from a given store index on, so the filtered view
+    is the same newest-first mapping over that array, and appended rows only
+    have to be matched themselves.  This takes the place of a
+    QSortFilterProxyModel, whose filterAcceptsRow would be called in python
+    for every row of the store on every keystroke.
+    """
+    headers=["Time","Team","Description","Status"]
+    fetchBatch=500
+
+    def __init__(self,store=None,parent=None):
+        QAbstractTableModel.__init__(self,parent)
+        if store is None:
+            store=RadioLogStore()
+        self.store=store
+        self.brushes={
+            True:QBrush(QColor(HIGHLIGHT_COLOR)),
+            False:QBrush(QColor(PROCESSED_COLOR))}
+        self.matcher=None
+        self.filterRows=None    # store indices shown while filtered, ascending
+        self.fetched=min(len(self.store),self.fetchBatch)
+
+    # shownCount - the number of rows in the view, fetched or not
+    def shownCount(self):
+        if self.filterRows is None:
+            return len(self.store)
+        return len(self.filterRows)
+
+    def storeIndex(self,row):
+        if self.filterRows is None:
+            return len(self.store)-1-row
+        return int(self.filterRows[len(self.filterRows)-1-row])
+
+    def rowCount(self,parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.fetched
+
+    def canFetchMore(self,parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.fetched<self.shownCount()
+
+    def fetchMore(self,parent=QModelIndex()):
+        if parent.isValid():
+            return
+        n=min(self.fetchBatch,self.shownCount()-self.fetched)
+        if n<=0:
+            return
+        self.beginInsertRows(QModelIndex(),self.fetched,self.fetched+n-1)
+        self.fetched+=n
+        self.endInsertRows()
+
+    def columnCount(self,parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def data(self,index,role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        i=self.storeIndex(index.row())
+        if role==Qt.DisplayRole:
+            return self.store.columns[index.column()][i]
+        if role==Qt.BackgroundRole:
+            return self.brushes[self.store.isHighlighted(i)]
+        return QVariant()
+
+    def headerData(self,section,orientation,role=Qt.DisplayRole):
+        if role==Qt.DisplayRole and orientation==Qt.Horizontal:
+            return self.headers[section]
+        return QVariant()
+
+    def appendRows(self,rows,fingerprints=None,epochs=None):
+        # rows are in arrival order; they all end up above the existing rows
+        rows=list(rows)
+        if not rows:
+            return
+        if self.filterRows is None:
+            self.beginInsertRows(QModelIndex(),0,len(rows)-1)
+            self.store.extend(rows,fingerprints,epochs)
+            self.fetched+=len(rows)
+            self.endInsertRows()
+            return
+        # filtered: only the new rows that match are inserted
+        import numpy as np
+        start=len(self.store)
+        self.store.extend(rows,fingerprints,epochs)
+        matched=self.matcher(start)
+        if not len(matched):
+            return
+        self.beginInsertRows(QModelIndex(),0,len(matched)-1)
+        self.filterRows=np.concatenate([self.filterRows,matched])
+        self.fetched+=len(matched)
+        self.endInsertRows()
+
+    # setFilter - show only the rows picked by matcher(start), which returns
+    #  the ascending store indices of the matching rows from start on; None
+    #  shows every row again
+    def setFilter(self,matcher):
+        self.beginResetModel()
+        self.matcher=matcher
+        self.filterRows=None if matcher is None else matcher(0)
+        self.fetched=min(self.shownCount(),self.fetchBatch)
+        self.endResetModel()
+
+    def toggleHighlight(self,row):
+        self.store.toggleHighlight(self.storeIndex(row))
+        self.dataChanged.emit(self.index(row,0),self.index(row,self.columnCount()-1),[Qt.BackgroundRole])
+
+    def resetFromStore(self):
+        # call after the store has been filled or replaced in bulk
+        self.beginResetModel()
+        if self.matcher is not None:
+            self.filterRows=self.matcher(0)
+        self.fetched=min(self.shownCount(),self.fetchBatch)
+        self.endResetModel()
@@ -0,0 +1,162 @@
+# #############################################################################
+#
+#  radiolog_store.py - compact, append-only columnar storage for the radiolog
+#    rows shown by plans_console.  Kept free of any Qt dependency so that it
+#    can be shared by the GUI table model and by non-GUI code.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+
+import sys
+import hashlib
+from array import array
+
+# background colors of the two highlight states; these are also the color
+#  names written to the saved session file
+HIGHLIGHT_COLOR="#ffff00"   # new entry, not yet processed by plans
+PROCESSED_COLOR="#cccccc"   # entry has been clicked / processed
+
+class RadioLogStore():
+    """
+    Columnar store of radiolog rows in arrival order (oldest first).
+
+    Each column is a plain list; callsign and status values repeat heavily so
+    they are interned.  The highlight state of each row is kept in a packed
+    bitmap (one bit per row, 1 = highlighted).
+
+    Each row can also carry the fingerprint of the radiolog line it came
+    from (see rowFingerprint; 0 if unknown, e.g. rows from session files
+    written before fingerprints were kept); the set of fingerprints lets
+    newEntries drop lines that are read a second time.
+
+    Rows also keep radiolog's epoch column, the time the entry was logged
+    in epoch seconds (0 if unknown); the time column is only a clock time.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.times=[]
+        self.callsigns=[]
+        self.msgs=[]
+        self.statuses=[]
+        self.highlight=bytearray()
+        self.fingerprints=array('q')
+        self.fingerprintSet=set()
+        self.epochs=array('d')
+        # column lists in display order, for direct indexing by the model
+        self.columns=(self.times,self.callsigns,self.msgs,self.statuses)
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self,time,callsign,msg,status,highlighted=True,fingerprint=0,epoch=0):
+        i=len(self.times)
+        self.fingerprints.append(fingerprint)
+        self.epochs.append(epoch)
+        if fingerprint:
+            self.fingerprintSet.add(fingerprint)
+        self.times.append(time)
+        self.callsigns.append(sys.intern(callsign))
+        self.msgs.append(msg)
+        self.statuses.append(sys.intern(status))
+        if i>>3>=len(self.highlight):
+            self.highlight.append(0)
+        if highlighted:
+            self.highlight[i>>3]|=1<<(i&7)
+        return i
+
+    def extend(self,rows,fingerprints=None,epochs=None):
+        # bulk append; rows is a list of (time,callsign,msg,status) or of
+        #  (time,callsign,msg,status,highlighted) sequences - all one kind
+        if not rows:
+            return
+        n0=len(self.times)
+        if fingerprints:
+            self.fingerprints.extend(fingerprints)
+            self.fingerprintSet.update(fingerprints)
+            self.fingerprintSet.discard(0)
+        else:
+            self.fingerprints.frombytes(bytes(8*len(rows)))    # all unknown
+        if epochs:
+            self.epochs.extend(epochs)
+        else:
+            self.epochs.frombytes(bytes(8*len(rows)))  # 0.0: all unknown
+        cols=list(zip(*rows))
+        self.times.extend(cols[0])
+        self.callsigns.extend(map(sys.intern,cols[1]))
+        self.msgs.extend(cols[2])
+        self.statuses.extend(map(sys.intern,cols[3]))
+        n=len(self.times)
+        self.highlight.extend(bytes(((n+7)>>3)-len(self.highlight)))
+        hl=self.highlight
+        if len(cols)>4:
+            for i,flag in enumerate(cols[4],n0):
+                if flag:
+                    hl[i>>3]|=1<<(i&7)
+        else:
+            for i in range(n0,n):
+                hl[i>>3]|=1<<(i&7)
+
+    def row(self,i):
+        return (self.times[i],self.callsigns[i],self.msgs[i],self.statuses[i])
+
+    def isHighlighted(self,i):
+        return bool(self.highlight[i>>3]&(1<<(i&7)))
+
+    def setHighlighted(self,i,highlighted):
+        if highlighted:
+            self.highlight[i>>3]|=1<<(i&7)
+        else:
+            self.highlight[i>>3]&=~(1<<(i&7))&0xff
+
+    def toggleHighlight(self,i):
+        self.highlight[i>>3]^=1<<(i&7)
+        return self.isHighlighted(i)
+
+    def color(self,i):
+        if self.isHighlighted(i):
+            return HIGHLIGHT_COLOR
+        return PROCESSED_COLOR
+
+    # newEntries - the (time,callsign,msg,status) rows, their fingerprints
+    #  and their epochs, for the entries read from a radiolog csv file that
+    #  are not in the store yet; lines without radiolog's ten columns are
+    #  skipped
+    def newEntries(self,entries):
+        rows=[]
+        fingerprints=[]
+        epochs=[]
+        seen=self.fingerprintSet
+        batch=set()
+        for e in entries:
+            if len(e)!=10:
+                continue
+            fp=rowFingerprint(e)
+            if fp in seen or fp in batch:
+                continue
+            batch.add(fp)
+            rows.append((e[0],e[2],e[3],e[5]))
+            fingerprints.append(fp)
+            epochs.append(entryEpoch(e[6]))
+        return rows,fingerprints,epochs
+
+# entryEpoch - radiolog's epoch column as seconds; 0 if it is not a number
+def entryEpoch(text):
+    try:
+        epoch=float(text)
+    except ValueError:
+        return 0.0
+    return epoch if epoch>0 else 0.0
+
+# rowFingerprint - a stable (unlike hash(), the same in every run) nonzero
+#  64 bit key for a radiolog line: a hash of all of its fields, including
+#  the epoch column - radiolog's own timestamp for the entry, so two entries
+#  with the same text still differ
+def rowFingerprint(entry):
+    digest=hashlib.blake2b("\x1f".join(entry).encode("utf-8","replace"),digest_size=8).digest()
+    return int.from_bytes(digest,"big",signed=True) or 1
@@ -0,0 +1,153 @@
+# #############################################################################
+#
+#  sartopo_outbox.py - durable queue of map operations waiting to be sent to
+#    sartopo, so that nothing is lost while the map is unreachable.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Operations are rows in a small SQLite database and are sent in the order
+#   they were queued.  Each operation has a name ('setMarker', 'delMarker'),
+#   a JSON list of arguments, and optionally a key (the team).  An operation
+#   with a key describes the latest desired state for that key, so queueing
+#   one replaces whatever was still pending for the same key: a team that is
+#   reassigned several times before the queue is flushed costs one request.
+#
+#  flush() hands runs of consecutive operations of the same kind to a
+#   handler in batches; the handler returns one True/False per operation,
+#   successful ones are removed, and flushing stops at the first failure so
+#   the rest is retried later in order.
+#
+#  The same database keeps the id of the marker that was last posted for each
+#   team, so that moving or deleting a team's marker does not need a search
+#   of the map.  It is only a hint: the caller reconciles it against the
+#   synced map state and drops entries that turn out to be stale.  It also
+#   keeps the ids of every marker this console posted that may still be on
+#   the map (e.g. after a delete that failed), so that only those are ever
+#   removed as duplicates; markers put there by anyone else are left alone.
+#
+#  Operations and marker ids belong to the map they were meant for (its url,
+#   set with setMap when the session starts); only the current map's are
+#   counted, flushed or looked up, so what is left over from a session on
+#   another map is never sent to, or matched against, this one.
+#
+# #############################################################################
+
+import logging
+import os
+import json
+import time
+import sqlite3
+import threading
+
+log=logging.getLogger(__name__)
+
+class SartopoOutbox():
+    def __init__(self,fileName="./local/plans_console_outbox.db"):
+        self.fileName=fileName
+        dir=os.path.dirname(fileName)
+        if dir and not os.path.isdir(dir):
+            os.makedirs(dir)
+        self.lock=threading.Lock()
+        # used from the GUI thread (enqueue) and the worker thread (flush)
+        self.db=sqlite3.connect(fileName,check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS ops (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                        " op TEXT NOT NULL, key TEXT, args TEXT NOT NULL, created REAL NOT NULL, map TEXT NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS markerIds (map TEXT NOT NULL, team TEXT NOT NULL,"
+                        " id TEXT NOT NULL, PRIMARY KEY (map,team))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS postedIds (map TEXT NOT NULL, id TEXT NOT NULL,"
+                        " PRIMARY KEY (map,id))")
+        self.db.commit()
+        self.setMap(None)
+
+    # setMap - the map (url) that operations are queued for and flushed to
+    def setMap(self,map):
+        with self.lock:
+            self.map=map or ""
+            # read through an in-memory copy; every change is written through
+            self.markerIds=dict(self.db.execute("SELECT team,id FROM markerIds WHERE map=?",
+                                                (self.map,)).fetchall())
+            self.postedIds=set(id for (id,) in self.db.execute("SELECT id FROM postedIds WHERE map=?",
+                                                               (self.map,)))
+            others=self.db.execute("SELECT COUNT(*) FROM ops WHERE map!=?",(self.map,)).fetchone()[0]
+        if map and others:
+            log.info(str(others)+" queued map operations belong to other maps; they are not sent to this one")
+
+    def enqueue(self,op,args,key=None):
+        with self.lock:
+            if key is not None:
+                self.db.execute("DELETE FROM ops WHERE map=? AND key=?",(self.map,key))
+            self.db.execute("INSERT INTO ops (op,key,args,created,map) VALUES (?,?,?,?,?)",
+                            (op,key,json.dumps(args),time.time(),self.map))
+            self.db.commit()
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM ops WHERE map=?",(self.map,)).fetchone()[0]
+
+    def pending(self,limit=-1):
+        # list of (id,op,args) for the current map, oldest first
+        with self.lock:
+            rows=self.db.execute("SELECT id,op,args FROM ops WHERE map=? ORDER BY id LIMIT ?",
+                                 (self.map,limit)).fetchall()
+        return [(id,op,json.loads(args)) for id,op,args in rows]
+
+    def flush(self,handler,maxBatch=50):
+        # returns True if every operation that was attempted succeeded
+        ops=self.pending(maxBatch)
+        while ops:
+            op=ops[0][1]
+            n=1
+            while n<len(ops) and ops[n][1]==op:
+                n+=1
+            batch,ops=ops[:n],ops[n:]
+            try:
+                results=handler(op,[item[2] for item in batch])
+            except Exception as e:
+                log.warning("outbox "+op+" failed: "+str(e))
+                results=[False]*len(batch)
+            done=[(item[0],) for item,ok in zip(batch,results) if ok]
+            with self.lock:
+                self.db.executemany("DELETE FROM ops WHERE id=?",done)
+                self.db.commit()
+            if len(done)<len(batch):
+                return False
+        return True
+
+    def markerId(self,team):
+        return self.markerIds.get(team)
+
+    def setMarkerId(self,team,id):
+        # id None forgets the team's marker
+        with self.lock:
+            if id:
+                self.markerIds[team]=id
+                self.db.execute("INSERT OR REPLACE INTO markerIds (map,team,id) VALUES (?,?,?)",
+                                (self.map,team,id))
+            else:
+                self.markerIds.pop(team,None)
+                self.db.execute("DELETE FROM markerIds WHERE map=? AND team=?",(self.map,team))
+            self.db.commit()
+
+    # setPosted - record (posted True) or forget a marker this console put on
+    #  the map
+    def setPosted(self,id,posted=True):
+        with self.lock:
+            if posted:
+                self.postedIds.add(id)
+                self.db.execute("INSERT OR IGNORE INTO postedIds (map,id) VALUES (?,?)",(self.map,id))
+            else:
+                self.postedIds.discard(id)
+                self.db.execute("DELETE FROM postedIds WHERE map=? AND id=?",(self.map,id))
+            self.db.commit()
+
+    def isPosted(self,id):
+        return id in self.postedIds
+
+    def close(self):
+        with self.lock:
+            self.db.close()
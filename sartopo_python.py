@@ -83,15 +83,99 @@ import base64
 import requests
 import json
 import configparser
+import logging
 import os
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from json_stream import JsonArrayStream
+
+log=logging.getLogger(__name__)
+
+# probeVersion - the API version given the probe response codes so far
+#  (name: status code, or None for no response), or None while that is not
+#  known yet
+def probeVersion(codes):
+    if "v1" not in codes:
+        return None
+    if codes["v1"] is None:
+        log.warning("no response from the API v1 request; the server cannot be reached")
+        return -1
+    if codes["v1"]==200:
+        # now validate the mapID, since the API test doesn't care about mapID
+        if "map" not in codes:
+            return None
+        if codes["map"]!=200:
+            log.error("API version 1 detected, but the map-specific URL returned "+str(codes["map"])+" so this session is not valid.")
+            return -1
+        return 1
+    if "v0" not in codes:
+        return None
+    if codes["v0"]!=200:
+        log.error("no sartopo API found at this address")
+        return -1
+    # for v0, wait for the map URL request, which authenticates the session
+    if "map" not in codes:
+        return None
+    if codes["map"]==200:
+        log.info("API v0 session is now authenticated")
+    return 0
+
+# probeCache - domainAndPort: {"apiVersion":0|1, "time":t, "maps":{mapID:t}},
+#  shared by all sessions; loaded once from the first probeCacheFile given
+#  and written back to it after every change
+probeCache={}
+probeCacheLock=threading.Lock()
+probeCacheLoaded=set()
+
+def loadProbeCache(fileName):
+    if not fileName or fileName in probeCacheLoaded:
+        return
+    probeCacheLoaded.add(fileName)
+    try:
+        with open(fileName,"r") as f:
+            for domain,entry in json.load(f).items():
+                probeCache.setdefault(domain,entry)
+    except (OSError,ValueError):
+        pass
+
+def saveProbeCache(fileName):
+    if not fileName:
+        return
+    try:
+        with open(fileName+".tmp","w") as f:
+            json.dump(probeCache,f)
+        os.replace(fileName+".tmp",fileName)
+    except OSError as e:
+        log.warning("could not write the API version cache "+fileName+": "+str(e))
 
 class SartopoSession():
-    def __init__(self,domainAndPort="localhost:8080",mapID=None,configpath=None,account=None,id=None,key=None):
+    def __init__(self,domainAndPort="localhost:8080",mapID=None,configpath=None,account=None,id=None,key=None,
+                 timeout=2,retries=3,backoffFactor=0.3,poolSize=10,probeCacheFile=None,probeCacheTTL=300):
         self.s=requests.session()
+        self.s.headers.update({"Connection":"keep-alive"})
+        # transport settings: default per-request timeout (seconds), number of
+        #  retries with exponential backoff for idempotent requests (GET,
+        #  DELETE), and the size of the keep-alive connection pool
+        self.timeout=timeout
+        self.retries=retries
+        self.backoffFactor=backoffFactor
+        self.poolSize=poolSize
+        # request metrics, by request type; see getStats
+        self.stats={}
+        self.statsLock=threading.Lock()
+        self.requestObserver=None # optional function(type,elapsed,ok) called after each request
         self.apiVersion=-1
+        # API versions found by setupSession are reused for probeCacheTTL
+        #  seconds, by every session in this process and, if probeCacheFile
+        #  is given, by the next run too
+        self.probeCacheFile=probeCacheFile
+        self.probeCacheTTL=probeCacheTTL
+        self.invalidReason=None # set if the session can never work as given; see isValid
         if not mapID or not isinstance(mapID,str) or len(mapID)<3:
-            print("ERROR: you must specify a three-or-more-character sartopo map ID string (end of the URL) when opening a SartopoSession object.")
+            self.invalidate("ERROR: you must specify a three-or-more-character sartopo map ID string (end of the URL) when opening a SartopoSession object.")
             return None
         self.mapID=mapID
         self.domainAndPort=domainAndPort
@@ -101,7 +185,61 @@ class SartopoSession():
         self.account=account
         self.id=id
         self.key=key
+        # local cache of the map state, kept current by syncFeatures with
+        #  since/<timestamp> delta requests; featureIndex maps each indexed
+        #  property to {value:set of feature ids}
+        self.mapState={}
+        self.mapStateTimestamp=0 # sartopo timestamp (integer ms) of the last sync
+        self.mapStateSyncTime=0 # local time of the last sync
+        self.cacheMaxAge=1.0 # seconds during which the cache is considered current
+        self.featureIndex={"class":{},"title":{},"folderId":{},"letter":{}}
+        self.cacheClasses=None # feature classes to keep in the cache; None keeps all
         self.setupSession()
+        # mounted after API detection, so that probing a dead host fails fast
+        self.setupTransport()
+
+    # invalidate - the session can not work as given (a bad map ID or
+    #  account configuration), however often it is retried
+    def invalidate(self,msg):
+        log.error(msg)
+        self.invalidReason=msg
+        return -1
+
+    def isValid(self):
+        return self.invalidReason is None
+
+    def setupTransport(self):
+        retryArgs=dict(total=self.retries,backoff_factor=self.backoffFactor,
+                       status_forcelist=[502,503,504],raise_on_status=False)
+        methods=frozenset(["GET","DELETE","HEAD","OPTIONS"])
+        try:
+            retry=Retry(allowed_methods=methods,**retryArgs)
+        except TypeError: # urllib3 older than 1.26
+            retry=Retry(method_whitelist=methods,**retryArgs)
+        adapter=HTTPAdapter(pool_connections=1,pool_maxsize=self.poolSize,max_retries=retry)
+        self.s.mount("http://",adapter)
+        self.s.mount("https://",adapter)
+
+    def recordRequest(self,type,elapsed,ok):
+        with self.statsLock:
+            st=self.stats.setdefault(type,{"count":0,"failures":0,"totalTime":0.0,"maxTime":0.0})
+            st["count"]+=1
+            if not ok:
+                st["failures"]+=1
+            st["totalTime"]+=elapsed
+            st["maxTime"]=max(st["maxTime"],elapsed)
+        if self.requestObserver:
+            self.requestObserver(type,elapsed,ok)
+
+    # getStats - request metrics by request type: count, failures, and
+    #  average and maximum latency in seconds
+    def getStats(self):
+        with self.statsLock:
+            rval={}
+            for type,st in self.stats.items():
+                rval[type]=dict(st)
+                rval[type]["avgTime"]=st["totalTime"]/st["count"] if st["count"] else 0.0
+            return rval
         
     def setupSession(self):
         if "sartopo.com" in self.domainAndPort.lower():
@@ -120,22 +258,18 @@ class SartopoSession():
             if self.configpath is not None:
                 if os.path.isfile(self.configpath):
                     if self.account is None:
-                        print("config file '"+self.configpath+"' is specified, but no account name is specified.")
-                        return -1
+                        return self.invalidate("config file '"+self.configpath+"' is specified, but no account name is specified.")
                     config=configparser.ConfigParser()
                     config.read(self.configpath)
                     if self.account not in config.sections():
-                        print("specified account '"+self.account+"' has no entry in config file '"+self.configpath+"'.")
-                        return -1
+                        return self.invalidate("specified account '"+self.account+"' has no entry in config file '"+self.configpath+"'.")
                     section=config[self.account]
                     id=section.get("id",None)
                     key=section.get("key",None)
                     if id is None or key is None:
-                        print("account entry '"+self.account+"' in config file '"+self.configpath+"' is not complete:\n  it must specify id and key.")
-                        return -1
+                        return self.invalidate("account entry '"+self.account+"' in config file '"+self.configpath+"' is not complete:\n  it must specify id and key.")
                 else:
-                    print("specified config file '"+self.configpath+"' does not exist.")
-                    return -1
+                    return self.invalidate("specified config file '"+self.configpath+"' does not exist.")
 
             # now allow values specified in constructor to override config file values
             if self.id is not None:
@@ -147,70 +281,105 @@ class SartopoSession():
             self.key=key
 
             if self.id is None:
-                print("sartopo session is invalid: 'id' must be specified for online maps")
-                return -1
+                return self.invalidate("sartopo session is invalid: 'id' must be specified for online maps")
             if self.key is None:
-                print("sartopo session is invalid: 'key' must be specified for online maps")
-                return -1
+                return self.invalidate("sartopo session is invalid: 'key' must be specified for online maps")
 
         # by default, do not assume any sartopo session is running;
-        # send a GET request to http://localhost:8080/api/v1/map/
-        #  response code 200 = new API
-        #  otherwise:
-        #    send a GET request to http://localhost:8080/rest/
-        #     response code 200 = old API
-        
+        # send GET requests, all at once, to
+        #   http://localhost:8080/api/v1/map/   response code 200 = new API
+        #   http://localhost:8080/m/<mapID>     200 = valid map (and, for the
+        #                                        old API, authenticates the session)
+        #   http://localhost:8080/rest/marker/  200 = old API
+        # and stop waiting as soon as the answer is known.  A version found
+        #  recently for this domain (and map) is reused without asking again;
+        #  see probeCache
         self.apiUrlMid="/invalid/"
-        url="http://"+self.domainAndPort+"/api/v1/map/"
-        print("searching for API v1: sending get to "+url)
+        codes=self.cachedProbeCodes()
+        version=probeVersion(codes)
+        if version is None:
+            version=self.probe(codes)
+        self.apiVersion=version
+        if version==1:
+            self.apiUrlMid="/api/v1/map/[MAPID]/"
+        elif version==0:
+            self.apiUrlMid="/rest/"
+        if version>=0:
+            self.storeProbe()
+        log.info("API version:"+str(self.apiVersion))
+
+    # probe - send the detection requests that codes has no answer for, in
+    #  parallel; returns the API version (-1 if none) as soon as it is known
+    #  and leaves any requests still outstanding to finish on their own.
+    #  The requests use their own short-lived sessions, without the retries
+    #  of the main one, so that a dead host fails fast
+    def probe(self,codes):
+        urls={"v1":"http://"+self.domainAndPort+"/api/v1/map/",
+              "map":"http://"+self.domainAndPort+"/m/"+self.mapID,
+              "v0":"http://"+self.domainAndPort+"/rest/marker/"}
+        def get(name):
+            s=requests.session()
+            try:
+                r=s.get(urls[name],timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                return name,None,s
+            return name,r.status_code,s
+        names=[name for name in urls if name not in codes]
+        if codes.get("v1")==200:
+            names.remove("v0")      # known to be API v1; only the map is in question
+        log.info("probing "+self.domainAndPort+" for the API version: "+", ".join(urls[name] for name in names))
+        executor=ThreadPoolExecutor(max_workers=len(names))
         try:
-            r=self.s.get(url,timeout=2)
-        except:
-            print("no response from first get request; aborting; should get a response of 400 at this point for api v0")
-        else:
-            print("response code = "+str(r.status_code))
-            if r.status_code==200:
-                # now validate the mapID, since the initial test doesn't care about mapID
-                mapUrl="http://"+self.domainAndPort+"/m/"+self.mapID
-                try:
-                    r=self.s.get(mapUrl,timeout=2)
-                except:
-                    print("API version 1 detected, but the mapID is not valid.")
-                else:
-                    if r.status_code==200:
-                        # now we know the API is valid and the mapID is valid
-                        self.apiVersion=1
-                        self.apiUrlMid="/api/v1/map/[MAPID]/"
-                    else:
-                        print("API version 1 detected, but the map-specific URL returned a code of "+str(r.status_code)+" so this session is not valid.")
-            else:
-                url="http://"+self.domainAndPort+"/rest/marker/"
-                print("searching for API v0: sending get to "+url)
-                try:
-                    r=self.s.get(url,timeout=2)
-                except:
-                    print("no response from second get request")
-                else:
-                    print("response code = "+str(r.status_code))
-                    if r.status_code==200:
-                        self.apiVersion=0
-                        self.apiUrlMid="/rest/"
-                        # for v0, send a get to the map URL to authenticate the session
-                        url="http://"+self.domainAndPort+"/m/"+self.mapID
-                        print("sending API v0 authentication request to url "+url)
-                        try:
-                            r=self.s.get(url,timeout=2)
-                        except:
-                            print("no response during authentication for API v0")
-                        else:
-                            print("response code = "+str(r.status_code))
-                            if r.status_code==200:
-                                print("API v0 session is now authenticated")
-        print("API version:"+str(self.apiVersion))
+            for future in as_completed([executor.submit(get,name) for name in names]):
+                name,code,s=future.result()
+                codes[name]=code
+                log.debug("  "+urls[name]+": "+("no response" if code is None else "response code = "+str(code)))
+                if name=="map":
+                    self.s.cookies.update(s.cookies)   # the map page authenticates an API v0 session
+                version=probeVersion(codes)
+                if version is not None:
+                    return version
+        finally:
+            executor.shutdown(wait=False)
+        return -1
+
+    def cachedProbeCodes(self):
+        # the probe responses implied by a recent detection for this domain;
+        #  the map page is always requested for API v0, which needs it to
+        #  authenticate the session
+        with probeCacheLock:
+            loadProbeCache(self.probeCacheFile)
+            entry=probeCache.get(self.domainAndPort)
+            if not entry or time.time()-entry["time"]>self.probeCacheTTL:
+                return {}
+            codes={"v1":200} if entry["apiVersion"]==1 else {"v1":404,"v0":200}
+            if entry["apiVersion"]==1 and time.time()-entry["maps"].get(self.mapID,0)<=self.probeCacheTTL:
+                codes["map"]=200
+        log.info("using the API version found for "+self.domainAndPort+" in the last "+str(self.probeCacheTTL)+" seconds")
+        return codes
+
+    def storeProbe(self):
+        now=time.time()
+        with probeCacheLock:
+            entry=probeCache.get(self.domainAndPort)
+            if not entry or entry["apiVersion"]!=self.apiVersion:
+                entry=probeCache[self.domainAndPort]={"apiVersion":self.apiVersion,"maps":{}}
+            entry["time"]=now
+            entry["maps"][self.mapID]=now
+            saveProbeCache(self.probeCacheFile)
+
+    # forgetProbe - drop this domain from the probe cache, so that the next
+    #  setupSession asks the server again
+    def forgetProbe(self):
+        with probeCacheLock:
+            if probeCache.pop(self.domainAndPort,None) is not None:
+                saveProbeCache(self.probeCacheFile)
         
-    def sendRequest(self,type,apiUrlEnd,j,id="",returnJson=None):
+    # sendRequest - returns -1 if the session is invalid or the request failed;
+    #  timeout overrides the session's default timeout for this request
+    def sendRequest(self,type,apiUrlEnd,j,id="",returnJson=None,timeout=None):
         if self.apiVersion<0:
-            print("sartopo session is invalid; request aborted: type="+str(type)+" apiUrlEnd="+str(apiUrlEnd))
+            log.warning("sartopo session is invalid; request aborted: type="+str(type)+" apiUrlEnd="+str(apiUrlEnd))
             return -1
         apiUrlEnd=apiUrlEnd.lower()
         if self.apiVersion>0:
@@ -224,41 +393,37 @@ class SartopoSession():
         mid=self.apiUrlMid.replace("[MAPID]",self.mapID)
         url="http://"+self.domainAndPort+mid+apiUrlEnd
 #         print("sending "+str(type)+" to "+url)
-        if type is "post":
-            params={}
-            params["json"]=json.dumps(j)
-            if "sartopo.com" in self.domainAndPort.lower():
-                expires=int(time.time()*1000)+120000 # 2 minutes from current time, in milliseconds
-                data="POST "+mid+apiUrlEnd+"\n"+str(expires)+"\n"+json.dumps(j)
-#                 print("pre-hashed data:"+data)                
-                token=hmac.new(base64.b64decode(self.key),data.encode(),'sha256').digest()
-                token=base64.b64encode(token).decode()
-#                 print("hashed data:"+str(token))
-                params["id"]=self.id
-                params["expires"]=expires
-                params["signature"]=token
-#             print("SENDING POST to '"+url+"':")
-#             print(json.dumps(params,indent=3))
-            r=self.s.post(url,data=params,timeout=2)
-        elif type is "get": # no need for json in GET; sending null JSON causes downstream error
-#             print("SENDING GET to '"+url+"':")
-            r=self.s.get(url,timeout=2)
-        elif type is "delete":
-            r=self.s.delete(url,timeout=2)
-        else:
-            print("Unrecognized request type:"+str(type))
+        if timeout is None:
+            timeout=self.timeout
+        if type not in ["post","get","delete"]:
+            log.error("Unrecognized request type:"+str(type))
+            return -1
+        t0=time.time()
+        try:
+            r=self.sendHttp(type,url,mid+apiUrlEnd,j,timeout,stream=(returnJson=="STREAM"))
+        except requests.exceptions.RequestException as e:
+            self.recordRequest(type,time.time()-t0,False)
+            log.warning("sartopo "+type+" request to "+url+" failed: "+str(e))
+            if isinstance(e,requests.exceptions.ConnectionError):
+                self.forgetProbe()    # check the server again on the next setupSession
             return -1
+        self.recordRequest(type,time.time()-t0,r.status_code<500)
 #         print("response code = "+str(r.status_code))
 #         print("response:")
 #         try:
 #             print(json.dumps(r.json(),indent=3))
 #         except:
 #             print(r.text)
+        if returnJson=="STREAM":
+            # features are decoded one at a time as the response is read
+            #  (see json_stream.py); the caller closes the stream, which
+            #  releases the connection however far it was read
+            return JsonArrayStream(r.iter_content(65536),("result","state","features"),close=r.close)
         if returnJson:
             try:
                 rj=r.json()
-            except:
-                print("response had no decodable json")
+            except ValueError:
+                log.warning("response had no decodable json")
                 return -1
             else:
                 if returnJson=="ID":
@@ -268,19 +433,84 @@ class SartopoSession():
                     elif 'id' in rj:
                         id=rj['id']
                     else:
-                        print("No valid ID was returned from the request:")
-                        print(json.dumps(rj,indent=3))
+                        log.warning("No valid ID was returned from the request:\n"+json.dumps(rj,indent=3))
                     return id
                 if returnJson=="ALL":
                     return rj
+
+    def sendHttp(self,type,url,path,j,timeout,stream=False):
+        if type=="post":
+            params={}
+            params["json"]=json.dumps(j)
+            if "sartopo.com" in self.domainAndPort.lower():
+                expires=int(time.time()*1000)+120000 # 2 minutes from current time, in milliseconds
+                data="POST "+path+"\n"+str(expires)+"\n"+json.dumps(j)
+#                 print("pre-hashed data:"+data)                
+                token=hmac.new(base64.b64decode(self.key),data.encode(),'sha256').digest()
+                token=base64.b64encode(token).decode()
+#                 print("hashed data:"+str(token))
+                params["id"]=self.id
+                params["expires"]=expires
+                params["signature"]=token
+#             print("SENDING POST to '"+url+"':")
+#             print(json.dumps(params,indent=3))
+            return self.s.post(url,data=params,timeout=timeout)
+        elif type=="get": # no need for json in GET; sending null JSON causes downstream error
+#             print("SENDING GET to '"+url+"':")
+            return self.s.get(url,timeout=timeout,stream=stream)
+        elif type=="delete":
+            return self.s.delete(url,timeout=timeout)
         
     def addFolder(self,label="New Folder"):
         j={}
         j['properties']={}
         j['properties']['title']=label
-        return self.sendRequest("post","folder",j,returnJson="ID")
+        id=self.sendRequest("post","folder",j,returnJson="ID")
+        if id and id!=-1:
+            self.cacheFeature({'id':id,'properties':{'class':'Folder','title':label}})
+        return id
     
     def addMarker(self,lat,lon,title="New Marker",description="",color="#FF0000",symbol="point",rotation=None,folderId=None,existingId=""):
+        j=self.markerJson(lat,lon,title,description,color,symbol,rotation,folderId,existingId)
+#         print("sending json: "+json.dumps(j.json(),indent=3))
+        id=self.sendRequest("post","marker",j,id=existingId,returnJson="ID")
+        if id and id!=-1:
+            j['id']=id
+            self.cacheFeature(j)
+        return id
+
+    # addMarkers - add (or move) several markers at once; each item of markers
+    #  is a dict of addMarker keyword arguments (lat and lon are required).
+    #  The posts are sent concurrently over the session's connection pool,
+    #  so the whole batch costs about one round trip.  Returns the list of
+    #  marker ids (or -1 / None for failures) in the same order.
+    def addMarkers(self,markers,maxWorkers=8):
+        jl=[]
+        for m in markers:
+            m=dict(m)
+            jl.append((self.markerJson(m.pop('lat'),m.pop('lon'),**m),m.get('existingId',"")))
+        if not jl:
+            return []
+        def post(item):
+            j,existingId=item
+            try:
+                return self.sendRequest("post","marker",j,id=existingId,returnJson="ID")
+            except Exception as e:
+                log.warning("marker post failed: "+str(e))
+                return -1
+        if len(jl)==1:
+            ids=[post(jl[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(maxWorkers,len(jl))) as executor:
+                ids=list(executor.map(post,jl))
+        # the cache is only touched from the calling thread
+        for (j,existingId),id in zip(jl,ids):
+            if id and id!=-1:
+                j['id']=id
+                self.cacheFeature(j)
+        return ids
+
+    def markerJson(self,lat,lon,title="New Marker",description="",color="#FF0000",symbol="point",rotation=None,folderId=None,existingId=""):
         j={}
         jp={}
         jg={}
@@ -299,15 +529,31 @@ class SartopoSession():
         j['type']='Feature'
         if existingId:
             j['id']=existingId
-#         print("sending json: "+json.dumps(j.json(),indent=3))
-        return self.sendRequest("post","marker",j,id=existingId,returnJson="ID")
+        return j
 
     def delMarker(self,existingId=""):
 #         print("sending json: "+json.dumps(j.json(),indent=3))
-        return self.sendRequest("delete","marker",None,id=existingId,returnJson="ALL")
+        rval=self.sendRequest("delete","marker",None,id=existingId,returnJson="ALL")
+        if rval!=-1:
+            self.uncacheFeature(existingId)
+        return rval
 
 
-    def getFeatures(self,featureClass=None,since=0):
+    # getFeatures - with stream=True the response is decoded feature by
+    #  feature and only features of featureClass (a class name or a list of
+    #  them) are kept, so a large map never has to be held in memory whole
+    def getFeatures(self,featureClass=None,since=0,stream=False):
+        if stream and featureClass:
+            classes=[featureClass] if isinstance(featureClass,str) else featureClass
+            features=self.sendRequest("get","since/"+str(since),None,returnJson="STREAM")
+            if features==-1:
+                return []
+            try:
+                with features:
+                    return [f for f in features if f.get('properties',{}).get('class') in classes]
+            except (ValueError,requests.exceptions.RequestException) as e:
+                log.warning("reading features failed: "+str(e))
+                return []
         rj=self.sendRequest("get","since/"+str(since),None,returnJson="ALL")
         if not featureClass:
             return rj # if no feature class is specified, return the entire json response
@@ -325,3 +571,92 @@ class SartopoSession():
                         
             return rval
 
+    # cacheFeature / uncacheFeature - add, replace or remove one feature in the
+    #  local map state and its indexes
+    def cacheFeature(self,feature):
+        id=feature.get('id')
+        if not id:
+            return
+        self.uncacheFeature(id)
+        self.mapState[id]=feature
+        prop=feature.get('properties',{})
+        for key in self.featureIndex:
+            value=prop.get(key)
+            if value is not None:
+                self.featureIndex[key].setdefault(str(value),set()).add(id)
+
+    def uncacheFeature(self,id):
+        feature=self.mapState.pop(id,None)
+        if feature is None:
+            return
+        prop=feature.get('properties',{})
+        for key in self.featureIndex:
+            value=prop.get(key)
+            if value is not None:
+                ids=self.featureIndex[key].get(str(value))
+                if ids:
+                    ids.discard(id)
+                    if not ids:
+                        del self.featureIndex[key][str(value)]
+
+    # syncFeatures - bring the local map state up to date; only the changes
+    #  since the previous sync cross the network.  Returns False if the
+    #  request failed (the cache is left as it was).
+    def syncFeatures(self,maxAge=None):
+        if maxAge is None:
+            maxAge=self.cacheMaxAge
+        if self.mapStateSyncTime and time.time()-self.mapStateSyncTime<maxAge:
+            return True
+        syncTime=time.time()
+        # the response is streamed: features are cached as they are decoded,
+        #  and those of classes not in cacheClasses are dropped right away
+        features=self.sendRequest("get","since/"+str(self.mapStateTimestamp),None,returnJson="STREAM")
+        if features==-1:
+            log.warning("map state sync failed; using cached features")
+            return False
+        try:
+            with features:
+                for feature in features:
+                    if isinstance(feature,dict) and (self.cacheClasses is None or
+                            feature.get('properties',{}).get('class') in self.cacheClasses):
+                        self.cacheFeature(feature)
+        except (ValueError,requests.exceptions.RequestException) as e:
+            # what was cached is still valid; the timestamp is not advanced,
+            #  so the next sync asks for the same changes again
+            log.warning("map state sync failed while reading: "+str(e))
+            return False
+        values=features.values
+        if not features.found and not any(key.startswith("result.") for key in values):
+            log.warning("map state sync failed; using cached features")
+            return False
+        # 'ids' lists every feature currently on the map, by class;
+        #  anything else in the cache has been deleted
+        if isinstance(values.get('result.ids'),dict):
+            current=set()
+            for ids in values['result.ids'].values():
+                current.update(ids)
+            for id in [id for id in self.mapState if id not in current]:
+                self.uncacheFeature(id)
+        timestamp=values.get('result.timestamp',values.get('timestamp'))
+        if not timestamp:
+            timestamp=int(syncTime*1000)
+        # back off a little so that features written during this request are not missed
+        self.mapStateTimestamp=max(int(timestamp)-500,0)
+        self.mapStateSyncTime=syncTime
+        return True
+
+    # findFeatures - query the local map state; each criterion that is given
+    #  must match (title, folderId and letter are compared as strings).
+    #  The cache is synced first unless sync=False.
+    def findFeatures(self,featureClass=None,title=None,folderId=None,letter=None,sync=True):
+        if sync:
+            self.syncFeatures()
+        ids=None
+        for key,value in [("class",featureClass),("title",title),("folderId",folderId),("letter",letter)]:
+            if value is None:
+                continue
+            matches=self.featureIndex[key].get(str(value),set())
+            ids=matches if ids is None else ids&matches
+        if ids is None:
+            return list(self.mapState.values())
+        return [self.mapState[id] for id in ids]
@@ -0,0 +1,66 @@
+# #############################################################################
+#
+#  sartopo_worker.py - run SartopoSession requests off the GUI thread
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Every map operation is queued to a single worker thread and run in the
+#   order it was submitted, so a delete followed by an add for the same team
+#   reaches sartopo in that order.  If a callback is given it is called on
+#   the GUI thread (through a queued signal) with the operation's return
+#   value, or with the exception it raised.
+#
+# #############################################################################
+
+import queue
+import logging
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+log=logging.getLogger(__name__)
+
+class SartopoWorker(QThread):
+    resultReady=pyqtSignal(object,object) # callback, result
+
+    def __init__(self,parent=None):
+        QThread.__init__(self,parent)
+        self.jobs=queue.Queue()
+        # self lives in the GUI thread, so this connection is queued when
+        #  the signal is emitted from run()
+        self.resultReady.connect(self.deliver)
+
+    def submit(self,func,*args,callback=None,**kwargs):
+        self.jobs.put((func,args,kwargs,callback))
+        if not self.isRunning():
+            self.start()
+
+    def pending(self):
+        return self.jobs.qsize()
+
+    def run(self):
+        while True:
+            job=self.jobs.get()
+            if job is None:
+                break
+            func,args,kwargs,callback=job
+            try:
+                result=func(*args,**kwargs)
+            except Exception as e:
+                log.exception("map operation "+getattr(func,"__name__",str(func))+" failed")
+                result=e
+            if callback is not None:
+                self.resultReady.emit(callback,result)
+
+    def deliver(self,callback,result):
+        callback(result)
+
+    def stop(self,timeout=5000):
+        # let queued operations finish (up to timeout ms), then end the thread
+        if self.isRunning():
+            self.jobs.put(None)
+            self.wait(timeout)
@@ -0,0 +1,171 @@
+# #############################################################################
+#
+#  session_journal.py - append-only journal of plans_console session events,
+#    periodically compacted into a snapshot, so that saving the session costs
+#    one short write per event instead of a rewrite of the whole session.
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Both files hold one compact JSON record per line; the snapshot is simply
+#   the shortest sequence of records that rebuilds the session, so restoring
+#   is 'replay the snapshot, then replay the journal'.  Record types:
+#
+#   {"t":"session", "url":..., "csv":..., "offset":..., "csvFiles":...}
+#         session settings; any subset of the keys may be present
+#   {"t":"rows", "rows":[[time,callsign,msg,status(,highlighted)],...], "fp":[...], "ep":[...]}
+#         radiolog rows appended, oldest first; highlighted defaults to 1.
+#         fp (optional) holds the fingerprint of each row's radiolog line
+#         (radiolog_store.rowFingerprint), 0 where it is not known
+#         ep (optional) holds each row's radiolog epoch column, the time it
+#         was logged in epoch seconds, 0 where it is not known
+#   {"t":"hl", "i":rowIndex, "v":0|1}
+#         highlight state of a radiolog row (index in arrival order)
+#   {"t":"team", "team":..., "assign":..., "type":..., "med":...}
+#         team added to or updated in the team/assignment table
+#   {"t":"rmteam", "team":...}
+#         team removed from the team/assignment table
+#   {"t":"gen", "g":generation}
+#         first line of both files: the number of compactions so far.  The
+#         snapshot is replaced before the journal is emptied, so after a
+#         crash between the two the journal is older than the snapshot,
+#         which already holds what it records; it is then skipped rather
+#         than replayed a second time
+#
+#  Session files written before the journal existed (a single JSON list)
+#   are still readable; they are converted to records on the fly.
+#
+# #############################################################################
+
+import logging
+import os
+import json
+
+from radiolog_store import PROCESSED_COLOR
+
+log=logging.getLogger(__name__)
+
+class SessionJournal():
+    def __init__(self,snapshotFileName="save_plans_console.txt",journalFileName=None,compactEvery=1000):
+        self.snapshotFileName=snapshotFileName
+        if journalFileName is None:
+            journalFileName=os.path.splitext(snapshotFileName)[0]+".journal"
+        self.journalFileName=journalFileName
+        self.compactEvery=compactEvery
+        self.journalCount=0   # records in the journal since the last compaction
+        self.legacy=False     # True if the last records() call read a pre-journal file
+        self.generation=0     # compactions of this session so far
+        self.staleJournal=False   # True if records() skipped a journal older than the snapshot
+        self.fid=None
+
+    def start(self,fresh=False):
+        # fresh=True discards any previous session
+        if fresh:
+            self.close()
+            for fileName in [self.snapshotFileName,self.journalFileName]:
+                if os.path.isfile(fileName):
+                    os.remove(fileName)
+            self.journalCount=0
+            self.generation=0
+            self.staleJournal=False
+        if self.staleJournal:
+            # what it holds is in the snapshot already
+            self.fid=open(self.journalFileName,'w',encoding='utf-8')
+            self.staleJournal=False
+        else:
+            self.fid=open(self.journalFileName,'a',encoding='utf-8')
+        if self.fid.tell()==0:
+            self.writeGeneration(self.fid)
+
+    def writeGeneration(self,f):
+        f.write(json.dumps({"t":"gen","g":self.generation},separators=(',',':'))+"\n")
+        f.flush()
+
+    def append(self,record):
+        if self.fid is None:
+            self.start()
+        self.fid.write(json.dumps(record,separators=(',',':'))+"\n")
+        self.fid.flush()
+        self.journalCount+=1
+
+    def needsCompaction(self):
+        return self.journalCount>=self.compactEvery
+
+    def compact(self,records):
+        # records is the full current session state, as produced by the caller;
+        #  the new snapshot replaces the old one atomically, then the journal
+        #  is emptied; both start with the new generation
+        generation=self.generation+1
+        tmpFileName=self.snapshotFileName+".tmp"
+        with open(tmpFileName,'w',encoding='utf-8') as f:
+            f.write(json.dumps({"t":"gen","g":generation},separators=(',',':'))+"\n")
+            for record in records:
+                f.write(json.dumps(record,separators=(',',':'))+"\n")
+        os.replace(tmpFileName,self.snapshotFileName)
+        self.generation=generation
+        self.staleJournal=False
+        self.close()
+        self.fid=open(self.journalFileName,'w',encoding='utf-8')
+        self.writeGeneration(self.fid)
+        self.journalCount=0
+
+    def close(self):
+        if self.fid:
+            self.fid.close()
+            self.fid=None
+
+    def records(self):
+        # generator: snapshot records followed by journal records, read one
+        #  line at a time; a torn last line (crash during a write) is ignored,
+        #  and so is a journal older than the snapshot (see "gen" above)
+        self.journalCount=0
+        self.legacy=False
+        self.generation=0
+        self.staleJournal=False
+        for fileName in [self.snapshotFileName,self.journalFileName]:
+            if not os.path.isfile(fileName):
+                continue
+            with open(fileName,'r',encoding='utf-8') as f:
+                for n,line in enumerate(f):
+                    if line.startswith('['):    # pre-journal session file
+                        self.legacy=True
+                        for record in legacyRecords(json.loads(line)):
+                            yield record
+                        continue
+                    try:
+                        record=json.loads(line)
+                    except ValueError:
+                        log.warning("skipping unreadable session record in "+fileName)
+                        continue
+                    if n==0 and isinstance(record,dict) and record.get("t")=="gen":
+                        if fileName==self.snapshotFileName:
+                            self.generation=record["g"]
+                        elif record["g"]<self.generation:
+                            log.warning("skipping "+fileName+": it is older than "+self.snapshotFileName+
+                                        ", which already holds what it records")
+                            self.staleJournal=True
+                            break
+                        continue
+                    if fileName==self.journalFileName and n==0 and self.generation>0:
+                        # a journal without a generation is from before the
+                        #  snapshot's first compaction
+                        log.warning("skipping "+fileName+": it is older than "+self.snapshotFileName)
+                        self.staleJournal=True
+                        break
+                    if fileName==self.journalFileName:
+                        self.journalCount+=1
+                    yield record
+
+def legacyRecords(l):
+    # convert the old single-list session format to journal records
+    watchedFile,offsetFileName,csvFiles=l[1]['csv'].split('%')
+    yield {"t":"session","url":l[0]['url'],"csv":watchedFile,"offset":offsetFileName,"csvFiles":csvFiles}
+    # legacy rows are newest first
+    rows=[[r['time'],r['callsign'],r['msg'],r['status'],int(r['color']!=PROCESSED_COLOR)] for r in reversed(list(l[2].values()))]
+    yield {"t":"rows","rows":rows}
+    for r in reversed(list(l[3].values())):
+        yield {"t":"team","team":r['team'],"assign":r['assign'],"type":r['type'],"med":r['med']}
@@ -0,0 +1,226 @@
+# #############################################################################
+#
+#  session_link.py - lets plans_console (the GUI) work as a client of a
+#    running plans_console_headless
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  The server (plans_console_headless --listen) owns the session: it reads
+#   the radiolog, keeps the journal and sends the map operations.  Clients
+#   get a copy of the session and send it their changes.  Both directions
+#   carry one JSON record per line, in the session journal's format (see
+#   session_journal.py):
+#
+#   server to client: the session as it is now (ConsoleSession.
+#     sessionRecords), then {"t":"live"}, then every record as it is
+#     journaled - new rows, and changes made by any client
+#   client to server: "team", "rmteam" and "hl" records, which are applied,
+#     journaled and relayed to every client; {"t":"op","op":...,"args":...,
+#     "key":...} to queue a map operation in the server's outbox; and
+#     {"t":"rescan"} to look for a newer csv file
+#
+#  Each client connection has a thread reading from it, which queues what it
+#   receives; the server's main loop (the only thread that touches the
+#   session) calls process() to handle it, so a new client's snapshot and the
+#   records that follow it go out in order.  A record from a client that is
+#   not one of those above, or lacks a field or has one of the wrong type,
+#   is dropped with a warning, and so is one whose handling fails, so a bad
+#   client can not take the session down.  There is no authentication:
+#   listen on localhost, or on a trusted network only.
+#
+# #############################################################################
+
+import json
+import queue
+import socket
+import logging
+import threading
+
+log=logging.getLogger(__name__)
+
+defaultPort=7741
+
+# splitAddress - (host,port) from 'host:port', 'host' or ':port'
+def splitAddress(address,defaultHost="127.0.0.1"):
+    host,sep,port=address.strip().rpartition(":")
+    if not sep:
+        host,port=port,""
+    return (host or defaultHost),int(port or defaultPort)
+
+def encode(record):
+    return (json.dumps(record,separators=(',',':'))+"\n").encode("utf-8")
+
+# the fields each kind of client record must have, and their types
+clientFields={
+    "team":{"team":str,"assign":str,"type":str,"med":str},
+    "rmteam":{"team":str},
+    "hl":{"i":int,"v":int},
+    "op":{"op":str,"args":list},
+    "rescan":{},
+}
+
+# recordProblem - why a record from a client can not be handled, or None if
+#  it can
+def recordProblem(record):
+    if not isinstance(record,dict):
+        return "not a record"
+    fields=clientFields.get(record.get("t"))
+    if fields is None:
+        return "unknown record type "+repr(record.get("t"))
+    for key,kind in fields.items():
+        value=record.get(key)
+        # bool is an int, but is not a row index or a highlight state
+        if not isinstance(value,kind) or isinstance(value,bool):
+            return "missing or invalid "+key
+    if record["t"]=="op" and not isinstance(record.get("key"),(str,type(None))):
+        return "invalid key"
+    if record["t"]=="hl" and record["v"] not in [0,1]:
+        return "invalid v"
+    return None
+
+class SessionServer():
+    def __init__(self,session,address,wakeup=None):
+        self.session=session
+        self.wakeup=wakeup      # threading.Event set when there is something to process
+        self.requests=queue.Queue()     # (kind,connection,record)
+        self.clients=[]
+        self.rescanRequested=False
+        self.listener=socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+        self.listener.bind(splitAddress(address))
+        self.listener.listen(5)
+        log.info("listening for plans_console clients on %s:%d"%self.listener.getsockname()[:2])
+        session.listeners.append(self.broadcast)
+        threading.Thread(target=self.acceptLoop,name="accept",daemon=True).start()
+
+    def acceptLoop(self):
+        while True:
+            try:
+                connection,address=self.listener.accept()
+            except OSError:
+                return      # closed
+            log.info("plans_console client connected from %s:%d"%address[:2])
+            connection.settimeout(10)   # for sends; a stuck client is dropped
+            self.queue("connect",connection)
+            threading.Thread(target=self.readLoop,args=(connection,),name="client",daemon=True).start()
+
+    def readLoop(self,connection):
+        try:
+            for line in connection.makefile("r",encoding="utf-8"):
+                try:
+                    self.queue("record",connection,json.loads(line))
+                except ValueError:
+                    log.warning("unreadable record from a client: "+line[:80])
+        except OSError:
+            pass
+        self.queue("disconnect",connection)
+
+    def queue(self,kind,connection,record=None):
+        self.requests.put((kind,connection,record))
+        if self.wakeup:
+            self.wakeup.set()
+
+    # process - call from the thread that owns the session
+    def process(self):
+        while True:
+            try:
+                kind,connection,record=self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if kind=="connect":
+                try:
+                    for r in self.session.sessionRecords():
+                        connection.sendall(encode(r))
+                    connection.sendall(encode({"t":"live"}))
+                    self.clients.append(connection)
+                except OSError as e:
+                    log.warning("could not send the session to a client: "+str(e))
+                    connection.close()
+            elif kind=="disconnect":
+                if connection in self.clients:
+                    self.clients.remove(connection)
+                    log.info("plans_console client disconnected")
+                connection.close()
+            else:
+                try:
+                    self.handle(record)
+                except Exception as e:
+                    log.exception("dropping a client record that could not be handled: "+str(e))
+
+    def handle(self,record):
+        problem=recordProblem(record)
+        if problem is None and record["t"]=="hl" and not 0<=record["i"]<len(self.session.store):
+            problem="no row "+str(record["i"])
+        if problem:
+            log.warning("dropping a record from a client ("+problem+"): "+str(record)[:80])
+            return
+        t=record["t"]
+        if t in ["team","rmteam","hl"]:
+            self.session.commit(record)
+        elif t=="op":
+            self.session.queueMapOp(record["op"],record["args"],record.get("key"))
+        elif t=="rescan":
+            self.rescanRequested=True
+
+    def broadcast(self,record):
+        if not self.clients:
+            return
+        data=encode(record)
+        for connection in list(self.clients):
+            try:
+                connection.sendall(data)
+            except OSError as e:
+                log.warning("dropping a plans_console client: "+str(e))
+                self.clients.remove(connection)
+                connection.close()
+
+    def close(self):
+        self.listener.close()
+        for connection in self.clients:
+            connection.close()
+        self.clients=[]
+
+class SessionClient():
+    def __init__(self,address,timeout=5.0):
+        self.connection=socket.create_connection(splitAddress(address),timeout)
+        self.connection.settimeout(None)
+        self.records=queue.Queue()  # from the server; None once the connection is lost
+        self.connected=True
+        self.lock=threading.Lock()
+        threading.Thread(target=self.readLoop,name="server",daemon=True).start()
+
+    def readLoop(self):
+        try:
+            for line in self.connection.makefile("r",encoding="utf-8"):
+                try:
+                    self.records.put(json.loads(line))
+                except ValueError:
+                    log.warning("unreadable record from the server: "+line[:80])
+        except OSError:
+            pass
+        self.connected=False
+        self.records.put(None)
+
+    def send(self,record):
+        if not self.connected:
+            log.warning("not connected to the server; dropping a "+str(record.get("t"))+" record")
+            return
+        with self.lock:
+            try:
+                self.connection.sendall(encode(record))
+            except OSError as e:
+                log.error("lost the connection to the server: "+str(e))
+                self.connected=False
+
+    def close(self):
+        self.connected=False
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.connection.close()
@@ -0,0 +1,63 @@
+# #############################################################################
+#
+#  stats_panel.py - a small window showing plans_console's live timings
+#    and rates, from perf_stats
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Opened with F2 from the main window, or at startup with statsPanel=1 in
+#   the config file.  It is refreshed once a second while it is visible.
+#
+# #############################################################################
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView
+
+class StatsPanel(QDialog):
+    headers=["","count","p50 ms","p99 ms","max ms","per min","per sec"]
+
+    def __init__(self,stats,parent=None):
+        QDialog.__init__(self,parent,Qt.Window)
+        self.stats=stats
+        self.setWindowTitle("Plans_console performance")
+        self.resize(640,300)
+        self.table=QTableWidget(0,len(self.headers),self)
+        self.table.setHorizontalHeaderLabels(self.headers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0,QHeaderView.Stretch)
+        layout=QVBoxLayout(self)
+        layout.addWidget(self.table)
+        self.timer=QTimer(self)
+        self.timer.timeout.connect(self.refreshTable)
+        self.timer.start(1000)
+
+    def refreshTable(self):
+        if not self.isVisible():
+            return
+        snap=self.stats.snapshot()
+        rows=[]
+        for name,t in sorted(snap["timers"].items()):
+            rows.append([name,str(t["count"]),"%.1f"%(1000*t["p50"]),"%.1f"%(1000*t["p99"]),
+                         "%.1f"%(1000*t["max"]),"",""])
+        for name,c in sorted(snap["counters"].items()):
+            rows.append([name,str(c["total"]),"","","","%.0f"%c["perMinute"],"%.1f"%c["perSecond"]])
+        self.table.setRowCount(len(rows))
+        for r,row in enumerate(rows):
+            for col,text in enumerate(row):
+                item=self.table.item(r,col)
+                if item is None:
+                    item=QTableWidgetItem()
+                    if col>0:
+                        item.setTextAlignment(Qt.AlignRight|Qt.AlignVCenter)
+                    self.table.setItem(r,col,item)
+                item.setText(text)
+
+    def showEvent(self,event):
+        QDialog.showEvent(self,event)
+        self.refreshTable()
@@ -0,0 +1,156 @@
+# #############################################################################
+#
+#  team_markers.py - keep the team markers on the sartopo map in line with
+#    the operations queued in the outbox
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Team markers live in the aTEAMS folder and are titled with the team name.
+#   flush() sends everything pending in the outbox (see sartopo_outbox.py);
+#   it makes blocking requests, so plans_console calls it on the worker
+#   thread.  A setMarker operation is [team,assign,type,med,lat,lon]; a
+#   delMarker operation is [team].
+#
+#  The outbox's team to marker id index lets a marker be moved or deleted
+#   with a single request.  reconcileMarkerIds checks it against the synced
+#   map cache once per connection, and whenever a team is not in it.  A
+#   second marker for a team is deleted only if this console posted it (the
+#   outbox records those ids); otherwise it is logged and left on the map.
+#
+# #############################################################################
+
+import logging
+
+log=logging.getLogger(__name__)
+
+class TeamMarkers():
+    def __init__(self,sts,outbox,folderTitle="aTEAMS"):
+        self.sts=sts
+        self.outbox=outbox
+        self.folderTitle=folderTitle
+        self.folderId=None
+        self.markerIdsChecked=False
+
+    # flush - returns True if everything that was attempted succeeded, and
+    #  None if the session is invalid, i.e. retrying can not help
+    def flush(self):
+        if not self.sts.isValid():
+            return None
+        if self.sts.apiVersion < 0:
+            self.markerIdsChecked=False
+            self.sts.setupSession()     # try to connect again
+            if self.sts.apiVersion < 0:
+                return False
+        if not self.markerIdsChecked:
+            # the map may have changed while it was not being watched
+            if not self.sts.syncFeatures():
+                return False
+            self.reconcileMarkerIds()
+            self.markerIdsChecked=True
+        return self.outbox.flush(self.runMapOps)
+
+    # runMapOps - outbox handler; returns one True/False per operation
+    def runMapOps(self,op,argsList):
+        if op == "setMarker":
+            return [id not in [None,-1] for id in self.setMarkers(argsList)]
+        if op == "delMarker":
+            return [self.delMarker(args[0]) for args in argsList]
+        log.warning("unknown map operation "+str(op)+"; dropping it")
+        return [True]*len(argsList)
+
+    # setMarkers - teams is a list of [team,assign,type,med,lat,lon]; all
+    #  markers are posted in one batch.  A team's existing marker (known from
+    #  the team to marker id index) is moved in place rather than deleted and
+    #  re-created
+    def setMarkers(self,teams):
+        if not self.folderId or not all(self.outbox.markerId(t[0]) for t in teams):
+            # look on the map for a folder or markers not in the index yet
+            if not self.sts.syncFeatures():
+                return [-1]*len(teams)
+            self.reconcileMarkerIds()
+        if not self.folderId:
+            fid=self.sts.addFolder(self.folderTitle)
+            if fid in [None,-1]:
+                return [-1]*len(teams)
+            self.folderId=fid
+        markers=[]
+        for team,assign,type,med,lat,lon in teams:
+            ## icons
+            if med == " X":
+                markr = "ncssar-9"     # medical +
+                clr = "FF0000"
+            elif type == "LE": # law enforcement
+                markr = "ncssar-5"     # red dot with blue circle
+                clr = "FF0000"
+            else:
+                markr = "usar-1"       # default
+                clr = "FFFF00"
+            existingId=self.outbox.markerId(team) or ""
+            log.debug("In setMarker:"+team+" existing marker:"+existingId)
+            markers.append({"lat":lat,"lon":lon,"title":team,"description":assign,
+                            "color":clr,"symbol":markr,"folderId":self.folderId,
+                            "existingId":existingId})
+        ids=self.sts.addMarkers(markers)
+        for marker,id in zip(markers,ids):
+            if id not in [None,-1]:
+                self.outbox.setMarkerId(marker["title"],id)
+                self.outbox.setPosted(id)
+            elif marker["existingId"]:
+                # it may have been deleted on the map; search for it next time
+                self.outbox.setMarkerId(marker["title"],None)
+        return ids
+
+    def delMarker(self,team):
+        id=self.outbox.markerId(team)
+        if not id:
+            if not self.sts.syncFeatures():
+                return False
+            self.reconcileMarkerIds()
+            id=self.outbox.markerId(team)
+            if not id:
+                return True     # nothing to delete
+        log.debug("Marker ID:"+id+" of team: "+team)
+        rval=self.sts.delMarker(id)
+        # if the delete failed the next attempt searches the map again
+        self.outbox.setMarkerId(team,None)
+        if rval != -1:
+            self.outbox.setPosted(id,False)
+        return rval != -1
+
+    # reconcileMarkerIds - bring the team to marker id index in line with the
+    #  (just synced) map cache: forget markers that are gone or renamed, and
+    #  pick up team markers in the team folder that the index does not know
+    def reconcileMarkerIds(self):
+        self.folderId=None
+        for folder in self.sts.findFeatures("Folder",title=self.folderTitle,sync=False):
+            self.folderId=folder["id"]
+        for team,id in list(self.outbox.markerIds.items()):
+            feature=self.sts.mapState.get(id)
+            if feature is None or feature.get("properties",{}).get("title") != team:
+                self.outbox.setMarkerId(team,None)
+        for id in list(self.outbox.postedIds):
+            if id not in self.sts.mapState:
+                self.outbox.setPosted(id,False)     # deleted on the map
+        if not self.folderId:
+            return
+        for marker in self.sts.findFeatures("Marker",folderId=self.folderId,sync=False):
+            team=marker.get("properties",{}).get("title")
+            if not team:
+                continue
+            id=self.outbox.markerId(team)
+            if not id:
+                self.outbox.setMarkerId(team,marker["id"])
+            elif id != marker["id"]:
+                if not self.outbox.isPosted(marker["id"]):
+                    log.warning("team "+team+" has another marker ("+marker["id"]+") that this console "
+                                "did not post; leaving it on the map")
+                    continue
+                # left over from an earlier delete that failed
+                log.info("removing duplicate marker for team "+team)
+                if self.sts.delMarker(marker["id"]) != -1:
+                    self.outbox.setPosted(marker["id"],False)
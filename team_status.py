@@ -0,0 +1,112 @@
+# #############################################################################
+#
+#  team_status.py - the latest status and last contact of each team (radio
+#    callsign), kept up to date as radiolog rows are ingested
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Each row updates only its own team's entry (a dict lookup), so the cost
+#   per line does not grow with the log, and questions like "which teams
+#   have not been heard from in 45 minutes" only look at the teams, never
+#   at the history.
+#
+#  A row with a blank status leaves the team's status as it was.  A row's
+#   time is radiolog's epoch column when it has one.  Otherwise the time
+#   column, a clock time (HHMM), is taken as the latest such time not after
+#   the moment the row is ingested (or restored), so a log running past
+#   midnight still comes out in order.
+#
+#  Kept free of any Qt dependency, like the radiolog store.
+#
+# #############################################################################
+
+import time
+
+class TeamStatus():
+    __slots__=["callsign","status","statusSince","lastContact","lastMsg","lastRow","count"]
+
+    def __init__(self,callsign):
+        self.callsign=callsign
+        self.status=""
+        self.statusSince=None   # epoch seconds of the row that set the status
+        self.lastContact=None   # epoch seconds of the team's latest row
+        self.lastMsg=""
+        self.lastRow=-1         # radiolog store index of the latest row
+        self.count=0
+
+    def sinceContact(self,now=None):
+        if self.lastContact is None:
+            return None
+        return (now or time.time())-self.lastContact
+
+class TeamStatusStore():
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.teams={}   # callsign: TeamStatus
+
+    def __len__(self):
+        return len(self.teams)
+
+    def get(self,callsign):
+        return self.teams.get(callsign)
+
+    # update - one radiolog row, store index i, logged at epoch seconds when
+    def update(self,i,callsign,msg,status,when):
+        if not callsign:
+            return None
+        team=self.teams.get(callsign)
+        if team is None:
+            team=self.teams[callsign]=TeamStatus(callsign)
+        team.lastContact=when
+        team.lastMsg=msg
+        team.lastRow=i
+        team.count+=1
+        if status and status!=team.status:
+            team.status=status
+            team.statusSince=when
+        return team
+
+    # updateRows - rows in arrival order, (time,callsign,msg,status,...)
+    #  sequences, the first of them at store index start, with their epochs
+    #  (0 or None where unknown)
+    def updateRows(self,rows,start,epochs=None,now=None):
+        now=now or time.time()
+        times={}    # clock time: epoch seconds; rows come a few per minute
+        for i,row in enumerate(rows,start):
+            when=epochs and epochs[i-start]
+            if not when:
+                when=times.get(row[0])
+                if when is None:
+                    when=times[row[0]]=clockTime(row[0],now) or now
+            self.update(i,row[1],row[2],row[3],when)
+
+    # stale - the teams not heard from for more than the given number of
+    #  seconds, longest silent first
+    def stale(self,seconds,now=None):
+        now=now or time.time()
+        teams=[t for t in self.teams.values() if t.lastContact is not None and now-t.lastContact>seconds]
+        return sorted(teams,key=lambda t:t.lastContact)
+
+# clockTime - epoch seconds of the latest HHMM (or HH:MM) clock time not
+#  after now (allowing a minute for clocks that disagree); None if clock is
+#  not a time
+def clockTime(clock,now=None):
+    digits=clock.replace(":","").strip()
+    if len(digits)!=4 or not digits.isdigit():
+        return None
+    hours,minutes=int(digits[:2]),int(digits[2:])
+    if hours>23 or minutes>59:
+        return None
+    now=now or time.time()
+    local=time.localtime(now)
+    t=time.mktime((local.tm_year,local.tm_mon,local.tm_mday,hours,minutes,0,0,0,-1))
+    if t>now+60:
+        t=time.mktime((local.tm_year,local.tm_mon,local.tm_mday-1,hours,minutes,0,0,0,-1))
+    return t
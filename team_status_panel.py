@@ -0,0 +1,93 @@
+# #############################################################################
+#
+#  team_status_panel.py - a small window listing every team heard on the
+#    radio, with its status and how long since it was last heard from
+#
+#   developed for Nevada County Sheriff's Search and Rescue
+#
+#  See included file LICENSE.txt for full license terms, also
+#   available at http://opensource.org/licenses/gpl-3.0.html
+#
+# #############################################################################
+#
+#  Opened with F3 from the main window.  Teams are listed longest silent
+#   first; those not heard from for more than staleMinutes (config file,
+#   default 30) are shown in red.  Statuses are colored as in plans_console's
+#   statusColorDict.  It is refreshed once a second while it is visible,
+#   from the TeamStatusStore, so it costs the same however long the log is.
+#
+# #############################################################################
+
+import time
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView
+
+STALE_COLORS=["ff4444","eeeeee"]   # background, text
+
+class TeamStatusPanel(QDialog):
+    headers=["Team","Status","since","Last heard","min ago","msgs","Last message"]
+
+    def __init__(self,teamStatus,statusColors={},staleMinutes=30,parent=None):
+        QDialog.__init__(self,parent,Qt.Window)
+        self.teamStatus=teamStatus
+        self.statusColors=statusColors
+        self.staleMinutes=staleMinutes
+        self.brushes={}
+        self.setWindowTitle("Plans_console team status")
+        self.resize(760,400)
+        self.table=QTableWidget(0,len(self.headers),self)
+        self.table.setHorizontalHeaderLabels(self.headers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(len(self.headers)-1,QHeaderView.Stretch)
+        layout=QVBoxLayout(self)
+        layout.addWidget(self.table)
+        self.timer=QTimer(self)
+        self.timer.timeout.connect(self.refreshTable)
+        self.timer.start(1000)
+
+    def brush(self,color):
+        if color not in self.brushes:
+            self.brushes[color]=QBrush(QColor("#"+color))
+        return self.brushes[color]
+
+    def refreshTable(self):
+        if not self.isVisible():
+            return
+        now=time.time()
+        teams=sorted(self.teamStatus.teams.values(),key=lambda t:t.lastContact or 0)
+        self.table.setRowCount(len(teams))
+        for r,team in enumerate(teams):
+            since=team.sinceContact(now)
+            stale=since is not None and since>60*self.staleMinutes
+            row=[team.callsign,team.status,clock(team.statusSince),clock(team.lastContact),
+                 "" if since is None else "%d"%(since//60),str(team.count),team.lastMsg]
+            for col,text in enumerate(row):
+                item=self.table.item(r,col)
+                if item is None:
+                    item=QTableWidgetItem()
+                    if col in [4,5]:
+                        item.setTextAlignment(Qt.AlignRight|Qt.AlignVCenter)
+                    self.table.setItem(r,col,item)
+                item.setText(text)
+                if stale:
+                    colors=STALE_COLORS
+                elif col==1:
+                    colors=self.statusColors.get(team.status)
+                else:
+                    colors=None
+                if colors:
+                    item.setBackground(self.brush(colors[0]))
+                    item.setForeground(self.brush(colors[1]))
+                else:
+                    item.setData(Qt.BackgroundRole,None)
+                    item.setData(Qt.ForegroundRole,None)
+
+    def showEvent(self,event):
+        QDialog.showEvent(self,event)
+        self.refreshTable()
+
+def clock(t):
+    return "" if t is None else time.strftime("%H%M",time.localtime(t))
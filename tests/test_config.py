@@ -0,0 +1,29 @@
+# tests for console_session.readConfig, the config file parser shared by
+#  plans_console and plans_console_headless
+
+import os
+
+from console_session import readConfig
+
+def test_default_config():
+    fileName=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),"default.cfg")
+    config,problem=readConfig(fileName)
+    assert problem is None
+    assert config["watchedDir"]=="Z:\\"
+    assert config["listen"]=="off" and config["url"]==""
+
+def test_parsing(tmp_path):
+    fileName=tmp_path/"plans_console.cfg"
+    fileName.write_text("[Plans_console]\n# a comment=ignored\n\n watchedDir = /mnt/radiolog \n"
+                        "url=http://localhost:8080/m/ABC?a=b\n")
+    config,problem=readConfig(str(fileName))
+    assert problem is None
+    assert config=={"watchedDir":"/mnt/radiolog","url":"http://localhost:8080/m/ABC?a=b"}
+
+def test_invalid_files(tmp_path):
+    config,problem=readConfig(str(tmp_path/"missing.cfg"))
+    assert config=={} and "cannot read" in problem
+    fileName=tmp_path/"other.cfg"
+    fileName.write_text("[RadioLogViewer]\nwatchedDir=Z:\\\n")
+    config,problem=readConfig(str(fileName))
+    assert config=={} and "not a valid" in problem
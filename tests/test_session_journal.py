@@ -0,0 +1,59 @@
+# tests for session_journal.py: replaying the snapshot and the journal,
+#  including after a crash in the middle of a compaction
+
+import json
+import os
+
+from session_journal import SessionJournal
+
+def rows(*times):
+    return {"t":"rows","rows":[[t,"Team 1","msg "+t,""] for t in times]}
+
+def test_replay_and_compact(tmp_path):
+    journal=SessionJournal(str(tmp_path/"session.txt"))
+    journal.start(fresh=True)
+    journal.append({"t":"session","url":"localhost:8080/m/TEST"})
+    journal.append(rows("0100"))
+    assert list(journal.records())==[{"t":"session","url":"localhost:8080/m/TEST"},rows("0100")]
+    assert journal.journalCount==2
+
+    journal.compact([{"t":"session","url":"localhost:8080/m/TEST"},rows("0100")])
+    journal.append(rows("0105"))
+    journal.close()
+    journal=SessionJournal(str(tmp_path/"session.txt"))
+    assert list(journal.records())==[{"t":"session","url":"localhost:8080/m/TEST"},rows("0100"),rows("0105")]
+    assert journal.journalCount==1 and journal.generation==1
+
+def test_crash_during_compaction(tmp_path):
+    journal=SessionJournal(str(tmp_path/"session.txt"))
+    journal.start(fresh=True)
+    journal.append(rows("0100"))
+    journal.compact([rows("0100")])
+    journal.append(rows("0105"))
+    # the snapshot is replaced, but the process dies before the journal is
+    #  emptied
+    generation=journal.generation+1
+    with open(journal.snapshotFileName,'w',encoding='utf-8') as f:
+        for record in [{"t":"gen","g":generation},rows("0100"),rows("0105")]:
+            f.write(json.dumps(record)+"\n")
+    journal.close()
+
+    journal=SessionJournal(str(tmp_path/"session.txt"))
+    assert list(journal.records())==[rows("0100"),rows("0105")]
+    assert journal.staleJournal and journal.journalCount==0
+
+    # the session carries on in a fresh journal
+    journal.append(rows("0110"))
+    journal.close()
+    journal=SessionJournal(str(tmp_path/"session.txt"))
+    assert list(journal.records())==[rows("0100"),rows("0105"),rows("0110")]
+
+def test_files_without_generations(tmp_path):
+    # written before snapshots and journals were numbered
+    snapshot=tmp_path/"session.txt"
+    snapshot.write_text(json.dumps(rows("0100"))+"\n")
+    (tmp_path/"session.journal").write_text(json.dumps(rows("0105"))+"\n")
+    journal=SessionJournal(str(snapshot))
+    assert list(journal.records())==[rows("0100"),rows("0105")]
+    assert journal.journalCount==1
+    assert os.path.isfile(journal.journalFileName)
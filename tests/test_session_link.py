@@ -0,0 +1,145 @@
+# tests for session_link.py: a ConsoleSession served to a SessionClient over
+#  a real socket on localhost
+
+import json
+import queue
+import socket
+import time
+
+import pytest
+
+from console_session import ConsoleSession
+from session_link import SessionServer, SessionClient, recordProblem
+
+@pytest.fixture
+def server(tmp_path):
+    session=ConsoleSession(str(tmp_path),sessionFileName=str(tmp_path/"session.txt"),
+                           outboxFileName=str(tmp_path/"outbox.db"))
+    session.start("localhost:8080/m/TEST")
+    session.addRows([("0100","Team 1","at the trailhead","Working")],[11],[1700000000.0])
+    server=SessionServer(session,"127.0.0.1:0")
+    yield server
+    server.close()
+    session.close()
+
+def address(server):
+    return "127.0.0.1:%d"%server.listener.getsockname()[1]
+
+# process - run the server's main loop until condition() is true
+def process(server,condition,timeout=5.0):
+    deadline=time.time()+timeout
+    while time.time()<deadline:
+        server.process()
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+# receive - the records the client gets up to and including the first one of
+#  type t, while the server runs
+def receive(server,client,t,timeout=5.0):
+    records=[]
+    deadline=time.time()+timeout
+    while time.time()<deadline:
+        server.process()
+        try:
+            record=client.records.get(timeout=0.01)
+        except queue.Empty:
+            continue
+        assert record is not None,"connection lost"
+        records.append(record)
+        if record.get("t")==t:
+            return records
+    raise AssertionError("no "+t+" record")
+
+def test_round_trip(server):
+    session=server.session
+    client=SessionClient(address(server))
+    try:
+        snapshot=receive(server,client,"live")
+        assert snapshot[0]["url"]=="localhost:8080/m/TEST"
+        rows=[r for r in snapshot if r["t"]=="rows"]
+        assert rows[0]["rows"]==[["0100","Team 1","at the trailhead","Working",1]]
+        assert rows[0]["fp"]==[11] and rows[0]["ep"]==[1700000000.0]
+
+        # a client's change is applied, journaled and relayed back
+        team={"t":"team","team":"T9","assign":"AA","type":"GND","med":""}
+        client.send(team)
+        assert receive(server,client,"team")[-1]==team
+        assert session.teams=={"T9":["AA","GND",""]}
+        assert team in list(session.journal.records())
+
+        client.send({"t":"hl","i":0,"v":0})
+        receive(server,client,"hl")
+        assert not session.store.isHighlighted(0)
+
+        client.send({"t":"op","op":"setMarker","args":["T9","AA","GND","",39.0,-121.0],"key":"T9"})
+        process(server,lambda:session.outbox.count()==1)
+        assert session.outbox.pending()[0][1:]==("setMarker",["T9","AA","GND","",39.0,-121.0])
+
+        client.send({"t":"rescan"})
+        process(server,lambda:server.rescanRequested)
+
+        # new rows reach the client as they are journaled
+        session.addRows([("0105","Team 2","leaving base","")],[12],[1700000300.0])
+        assert receive(server,client,"rows")[-1]["rows"]==[["0105","Team 2","leaving base",""]]
+    finally:
+        client.close()
+
+@pytest.mark.parametrize("record",[
+    {"t":"team"},
+    {"t":"team","team":"T1","assign":"AA","type":"GND"},
+    {"t":"rmteam","team":7},
+    {"t":"hl","i":"0","v":1},
+    {"t":"hl","i":True,"v":1},
+    {"t":"hl","i":0,"v":2},
+    {"t":"op","op":"setMarker","args":{}},
+    {"t":"op","op":"setMarker","args":[],"key":5},
+    {"t":"session","url":"elsewhere"},
+    {"t":"rows","rows":[]},
+    {},
+    [1,2],
+    "team",
+    None,
+])
+def test_record_problem(record):
+    assert recordProblem(record)
+
+def test_malformed_records_are_dropped(server):
+    session=server.session
+    journaled=len(list(session.journal.records()))
+    connection=socket.create_connection(server.listener.getsockname())
+    try:
+        lines=['{"t":"team"}','[1,2]','"x"','not json','{"t":"hl","i":5,"v":1}',
+               '{"t":"op","op":"setMarker","args":null}','{"t":"session","url":"x"}',
+               json.dumps({"t":"team","team":"T1","assign":"AA","type":"GND","med":""})]
+        connection.sendall(("\n".join(lines)+"\n").encode("utf-8"))
+        # the server carries on, and handles the good record after the bad ones
+        process(server,lambda:"T1" in session.teams)
+        assert session.teams=={"T1":["AA","GND",""]}
+        assert session.url=="localhost:8080/m/TEST"
+        assert session.outbox.count()==0
+        assert len(list(session.journal.records()))==journaled+1
+
+        # and still serves new clients
+        client=SessionClient(address(server))
+        try:
+            assert receive(server,client,"live")
+        finally:
+            client.close()
+    finally:
+        connection.close()
+
+def test_failing_record_does_not_stop_the_server(server,monkeypatch):
+    session=server.session
+    def fail(record):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(session,"commit",fail)
+    client=SessionClient(address(server))
+    try:
+        receive(server,client,"live")
+        client.send({"t":"rmteam","team":"T1"})
+        client.send({"t":"rescan"})
+        process(server,lambda:server.rescanRequested)
+    finally:
+        client.close()